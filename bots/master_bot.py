@@ -3,6 +3,7 @@ from aiogram.filters import CommandStart, CommandObject
 from config import Config
 from services.db_service import create_new_user, get_user_by_id, get_user_by_shop_id
 from handlers.customer_handlers import show_shop_catalog
+from services.bot_manager import bot_manager
 from core.strings import Buttons, Messages
 
 router = Router()
@@ -61,8 +62,8 @@ async def cmd_start(message: types.Message, command: CommandObject):
     status_text = "💎 PRO" if is_pro else "🆓 FREE"
 
     # Shop-Link generieren
-    bot_info = await message.bot.get_me()
-    shop_link = f"https://t.me/{bot_info.username}?start={shop_id}"
+    bot_info = await bot_manager.get_identity(message.bot)
+    shop_link = f"https://t.me/{bot_info['username']}?start={shop_id}"
 
     # Dashboard-Text
     welcome_text = (
@@ -20,9 +20,28 @@ class Config:
     # Bot Tokens
     MASTER_BOT_TOKEN = os.getenv("MASTER_BOT_TOKEN")
     
+    # Update-Empfang: "polling" (Standard) oder "webhook"
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # z.B. https://own1shop.onrender.com
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Pflicht bei webhook: fest, für alle Worker gleich
+    PORT = int(os.getenv("PORT", "10000"))
+    BOT_STARTUP_CONCURRENCY = int(os.getenv("BOT_STARTUP_CONCURRENCY", "20"))  # Parallele Bot-Starts
+    POLLING_TIMEOUT = 30  # Sekunden Long-Polling pro getUpdates
+    BOT_RESTART_BACKOFF_BASE = float(os.getenv("BOT_RESTART_BACKOFF_BASE", "1"))  # Sekunden
+    BOT_RESTART_BACKOFF_MAX = float(os.getenv("BOT_RESTART_BACKOFF_MAX", "300"))  # Sekunden
+    
+    # Worker-Modus: "single" (alle Shop-Bots in diesem Prozess) oder "sharded" (Verteilung per Lease)
+    WORKER_MODE = os.getenv("WORKER_MODE", "single").lower()
+    WORKER_ID = os.getenv("WORKER_ID", "")  # Standard: hostname-pid
+    RUN_MASTER_BOT = os.getenv("RUN_MASTER_BOT", "true").lower() == "true"  # Master-Bot + Expiry-Check
+    LEASE_TTL = int(os.getenv("LEASE_TTL", "60"))  # Sekunden ohne Heartbeat bis zur Übernahme
+    LEASE_RENEW_INTERVAL = int(os.getenv("LEASE_RENEW_INTERVAL", "15"))  # Sekunden
+    
     # Supabase
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+    DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))  # Parallele DB-Requests
+    DB_TIMEOUT = int(os.getenv("DB_TIMEOUT", "10"))  # Sekunden pro Request
     
     # Limits & Pricing
     FREE_PRODUCT_LIMIT = 2
@@ -35,5 +54,53 @@ class Config:
     FREE_PAYMENT_METHODS = ["wallet_btc", "wallet_ltc"]  # Nur BTC & LTC für FREE
     PRO_PAYMENT_METHODS = ["wallet_btc", "wallet_ltc", "wallet_eth", "wallet_sol", "paypal_email"]
     
+    # Katalog (Produkte pro Seite; bei 1 wird das Produktbild angezeigt)
+    CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "5"))
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2000"))  # Shops im Cache
+    # Sekunden; der Cache ist prozesslokal - im Worker-Modus sehen andere Worker
+    # Änderungen erst nach Ablauf, daher dort kürzer
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "30" if WORKER_MODE == "sharded" else "300"))
+    
+    # Telegram HTTP-Pool (eine Session für alle Bots)
+    # Im Polling-Modus hält jeder Shop-Bot während getUpdates eine Verbindung -> Limit > Anzahl Bots
+    TELEGRAM_POOL_LIMIT = int(os.getenv("TELEGRAM_POOL_LIMIT", "1000"))  # Max. gleichzeitige Verbindungen
+    TELEGRAM_REQUEST_TIMEOUT = int(os.getenv("TELEGRAM_REQUEST_TIMEOUT", "60"))  # Sekunden
+    
+    # Telegram Sende-Limits
+    SEND_RATE_PER_BOT = float(os.getenv("SEND_RATE_PER_BOT", "30"))  # Nachrichten/Sekunde pro Bot
+    SEND_RATE_PER_CHAT = float(os.getenv("SEND_RATE_PER_CHAT", "1"))  # Nachrichten/Sekunde pro Privat-Chat
+    SEND_RATE_PER_GROUP = float(os.getenv("SEND_RATE_PER_GROUP", str(20 / 60)))  # 20 pro Minute pro Gruppe
+    SEND_CHAT_BURST = 3  # Kurzzeitig erlaubte Nachrichten am Stück pro Chat
+    SEND_MAX_RETRIES = 3  # Wiederholungen nach RetryAfter
+    SEND_MAX_CHAT_BUCKETS = 10000  # Danach werden inaktive Chat-Buckets entfernt
+    
+    # Krypto-Kurse (Price-Service)
+    PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL", "60"))  # Sekunden frisch
+    PRICE_MAX_STALE = int(os.getenv("PRICE_MAX_STALE", "900"))  # Bis dahin veralteten Kurs liefern + im Hintergrund erneuern
+    PRICE_HTTP_TIMEOUT = float(os.getenv("PRICE_HTTP_TIMEOUT", "5"))  # Sekunden
+    
     # Telegram File Upload
     MAX_IMAGE_SIZE_MB = 5  # Max 5MB für Produkt-Bilder
+    
+    # FSM-Storage (Formular-Zustände): "sqlite" (persistent, Standard) oder "memory"
+    # Beide sind prozesslokal: bei WORKER_MODE=sharded gehen offene Formulare bei Lease-Übergabe verloren
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite").lower()
+    FSM_STORAGE_PATH = os.getenv("FSM_STORAGE_PATH", "fsm_states.db")
+    FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 3600)))  # Inaktive Zustände verfallen (Sekunden)
+    FSM_MAX_DATA_BYTES = int(os.getenv("FSM_MAX_DATA_BYTES", str(64 * 1024)))  # Max. Daten pro Chat
+    
+    # Subscription-Ablauf: Sicherheits-Sweep in der DB (Sekunden)
+    EXPIRY_SWEEP_INTERVAL = int(os.getenv("EXPIRY_SWEEP_INTERVAL", "3600"))
+    
+    # Master-Dashboard: Statistiken cachen (Sekunden)
+    SYSTEM_STATS_CACHE_TTL = int(os.getenv("SYSTEM_STATS_CACHE_TTL", "30"))
+    
+    # CSV-Export: parallele Hintergrund-Worker
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+    
+    # Lager-Import per Datei: max. Größe (Bot-API erlaubt Downloads bis 20 MB)
+    STOCK_IMPORT_MAX_BYTES = int(os.getenv("STOCK_IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+    
+    # Profil-Cache (get_user_by_id)
+    PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "5000"))
+    PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "60"))  # Sekunden
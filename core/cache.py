@@ -0,0 +1,84 @@
+"""
+In-Process Caches
+Begrenzter LRU-Cache mit TTL für häufig gelesene Daten
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU-Cache mit fester Maximalgröße und Ablaufzeit pro Eintrag
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Wert holen (None bei Miss oder abgelaufenem Eintrag)
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Wert holen ohne Statistik und ohne LRU-Reihenfolge zu ändern
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Wert speichern (verdrängt den ältesten Eintrag bei vollem Cache)
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """
+        Eintrag entfernen
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Alle Einträge entfernen
+        """
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/Miss-Zähler für die Dimensionierung
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
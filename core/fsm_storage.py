@@ -0,0 +1,170 @@
+"""
+FSM Storage
+Persistenter SQLite-Speicher für FSM-Zustände (übersteht Neustarts)
+Inaktive Zustände verfallen nach FSM_STATE_TTL, Daten werden kompakt gespeichert
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Daten ab dieser Größe (Bytes) werden komprimiert
+COMPRESS_THRESHOLD = 512
+
+# Abgelaufene Zustände höchstens so oft aufräumen (Sekunden)
+PURGE_INTERVAL = 600
+
+
+class FSMDataTooLarge(ValueError):
+    """FSM-Daten überschreiten FSM_MAX_DATA_BYTES (Schreibvorgang verworfen, alter Stand bleibt)"""
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-Storage auf Basis einer lokalen SQLite-Datei
+    Alle Zugriffe laufen in einem eigenen Thread (SQLite blockiert)
+    """
+
+    def __init__(self, path: str, ttl: int, max_data_bytes: int):
+        self.ttl = ttl
+        self.max_data_bytes = max_data_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+        self._purged_at = 0.0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT,"
+            " data BLOB,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm(updated_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            getattr(key, "business_connection_id", None),
+            key.destiny
+        ))
+
+    def _encode(self, data: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Kompaktes JSON, ab COMPRESS_THRESHOLD mit zlib (Präfix z/j)
+        """
+        if not data:
+            return None
+
+        raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        blob = b"z" + zlib.compress(raw) if len(raw) > COMPRESS_THRESHOLD else b"j" + raw
+
+        if len(blob) > self.max_data_bytes:
+            raise FSMDataTooLarge(
+                f"FSM-Daten zu groß ({len(blob)} Bytes, max. {self.max_data_bytes})"
+            )
+        return blob
+
+    @staticmethod
+    def _decode(blob: Optional[bytes]) -> Dict[str, Any]:
+        if not blob:
+            return {}
+        raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+        return json.loads(raw)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ---- Synchron (im FSM-Thread) ----
+
+    def _load(self, key: str):
+        row = self._conn.execute(
+            "SELECT state, data, updated_at FROM fsm WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, None
+
+        state, data, updated_at = row
+        if updated_at < time.time() - self.ttl:
+            self._conn.execute("DELETE FROM fsm WHERE key = ?", (key,))
+            self._conn.commit()
+            return None, None
+        return state, data
+
+    def _save(self, key: str, column: str, value):
+        now = time.time()
+        self._conn.execute(
+            f"INSERT INTO fsm (key, {column}, updated_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, updated_at = excluded.updated_at",
+            (key, value, now)
+        )
+        # Leere Einträge sofort entfernen
+        self._conn.execute("DELETE FROM fsm WHERE key = ? AND state IS NULL AND data IS NULL", (key,))
+
+        if now - self._purged_at > PURGE_INTERVAL:
+            self._purged_at = now
+            deleted = self._conn.execute(
+                "DELETE FROM fsm WHERE updated_at < ?", (now - self.ttl,)
+            ).rowcount
+            if deleted:
+                logger.info(f"🧹 {deleted} abgelaufene FSM-Zustände entfernt")
+
+        self._conn.commit()
+
+    # ---- BaseStorage ----
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._run(self._save, self._key(key), "state", value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._run(self._load, self._key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._run(self._save, self._key(key), "data", self._encode(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, blob = await self._run(self._load, self._key(key))
+        return self._decode(blob)
+
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    FSM-Storage gemäß Config.FSM_STORAGE ("sqlite" oder "memory")
+    """
+    if Config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    if Config.WORKER_MODE == "sharded":
+        # Jeder Worker hat seine eigene Datei: bei Lease-Übergabe beginnt ein offenes Formular neu
+        logger.warning("⚠️ FSM-Storage ist pro Worker lokal - Zustände gehen bei Lease-Übergabe verloren")
+
+    logger.info(f"💾 FSM-Storage: SQLite ({Config.FSM_STORAGE_PATH}, TTL {Config.FSM_STATE_TTL}s)")
+    return SQLiteStorage(
+        path=Config.FSM_STORAGE_PATH,
+        ttl=Config.FSM_STATE_TTL,
+        max_data_bytes=Config.FSM_MAX_DATA_BYTES
+    )
@@ -1,7 +1,14 @@
+import logging
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject
-from services.db_service import db
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from config import Config
+from core.fsm_storage import FSMDataTooLarge
+from core.strings import Messages
+from services.db_service import get_shop_by_token
+from services.bot_manager import bot_manager
+
+logger = logging.getLogger(__name__)
 
 class ShopMiddleware(BaseMiddleware):
     async def __call__(
@@ -12,35 +19,56 @@ class ShopMiddleware(BaseMiddleware):
     ) -> Any:
         bot_info = data.get("bot")
         user = data.get("event_from_user")
-        
+
         # Sicherheitscheck für technische Events
         if not bot_info or not user:
             return await handler(event, data)
 
         bot_token = bot_info.token
-        
+        shop_owner_id = None
+
         # 1. Prüfe, ob es sich um einen Custom-Shop-Bot (Pro-User) handelt
-        shop_res = db.table("profiles").select("*").eq("custom_bot_token", bot_token).execute()
-        
-        if shop_res.data:
+        if bot_token != Config.MASTER_BOT_TOKEN:
+            # Shop-Index im Speicher (gefüllt von BotManager.start_shop_bot)
+            shop_owner_id = bot_manager.get_shop_owner_by_token(bot_token)
+
+            # Nur bei einem Miss die Datenbank fragen
+            if shop_owner_id is None:
+                shop_owner = await get_shop_by_token(bot_token)
+                if shop_owner:
+                    shop_owner_id = shop_owner["id"]
+                    bot_manager.register_shop_token(bot_token, shop_owner_id)
+
+        if shop_owner_id is not None:
             # KONTEXT: Dies ist ein spezifischer Shop-Bot eines Pro-Users
-            shop_owner = shop_res.data[0]
-            
             # Hier ist man nur der Chef (Owner), wenn die eigene ID dem Shop-Besitzer gehört
-            data["is_owner"] = (user.id == shop_owner["id"])
-            data["shop_owner_id"] = shop_owner["id"]
-            data["shop_data"] = shop_owner
+            data["is_owner"] = (user.id == shop_owner_id)
+            data["shop_owner_id"] = shop_owner_id
         else:
             # KONTEXT: Dies ist der Master-Bot (Own1Shop Hauptbot)
             # Im Master-Bot veraltet jeder User sein eigenes "Universum"
-            user_res = db.table("profiles").select("*").eq("id", user.id).execute()
-            
             data["is_owner"] = True  # Erlaubt den Zugriff auf das persönliche Dashboard
             data["shop_owner_id"] = user.id
-            
-            if user_res.data:
-                data["shop_data"] = user_res.data[0]
-            else:
-                data["shop_data"] = None
 
         return await handler(event, data)
+
+
+class FSMErrorMiddleware(BaseMiddleware):
+    """
+    Zu große FSM-Daten: Handler bricht ab, User bekommt einen Hinweis statt keiner Antwort
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        except FSMDataTooLarge as e:
+            logger.warning(f"FSM-Daten verworfen: {e}")
+            if isinstance(event, CallbackQuery):
+                await event.answer(Messages.FSM_DATA_TOO_LARGE, show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer(Messages.FSM_DATA_TOO_LARGE)
+
@@ -10,6 +10,7 @@ class Buttons:
     LIST_PRODUCTS = "📋 Meine Produkte"
     MANAGE_CATEGORIES = "📁 Kategorien verwalten"  # PRO
     SETTINGS = "⚙️ Shop-Einstellungen"
+    SALES_STATS = "📊 Verkaufsstatistik"
     
     # Shop Einstellungen
     CONF_BOT = "⚙️ Shop-Bot konfigurieren"
@@ -28,6 +29,7 @@ class Buttons:
     DELETE_PRODUCT = "🗑 Löschen"
     EDIT_PRODUCT = "✏️ Bearbeiten"
     BUY_NOW = "🛒 Jetzt kaufen ({price}€)"
+    BUY_ITEM = "🛒 {name} ({price}€)"
     CONTACT_SELLER = "📧 Verkäufer kontaktieren"
     CONFIRM_PAYMENT = "✅ Zahlung erhalten (Ware senden)"
     
@@ -36,6 +38,11 @@ class Buttons:
     DELETE_CATEGORY = "🗑 Kategorie löschen"
     VIEW_BY_CATEGORY = "📁 Nach Kategorie"
     VIEW_ALL = "📋 Alle anzeigen"
+    
+    # Blättern
+    PREV_PAGE = "◀️ Zurück"
+    NEXT_PAGE = "Weiter ▶️"
+    PAGE_INFO = "· {page}/{total} ·"
 
 
 class Messages:
@@ -51,9 +58,32 @@ class Messages:
         "🛠 **Shop-Verwaltung**\n\n"
         "🆔 Shop-ID: `{shop_id}`\n"
         "🔗 Kunden-Link:\n`{shop_link}`\n\n"
-        "💡 Teile diesen Link mit deinen Kunden, damit sie deinen Shop besuchen können!"
+        "💡 Teile diesen Link mit deinen Kunden, damit sie deinen Shop besuchen können!\n\n"
+        "📊 `/stats` - Verkaufsstatistik\n"
+        "📤 `/export` - Bestellungen & Lager als CSV"
+    )
+    
+    SELLER_STATS = (
+        "📊 **Verkaufsstatistik** (Tage in UTC)\n\n"
+        "**Heute:** `{today_completed}` Verkäufe · `{today_revenue}€`\n"
+        "**7 Tage:** `{week_completed}` Verkäufe · `{week_revenue}€`\n"
+        "**30 Tage:** `{month_completed}` Verkäufe · `{month_revenue}€`\n\n"
+        "**Gesamt:**\n"
+        "├─ 💳 Bestellungen: `{total}`\n"
+        "├─ ✅ Verkauft: `{completed}`\n"
+        "├─ ⏳ Offen: `{pending}`\n"
+        "├─ 🚫 Storniert: `{cancelled}`\n"
+        "└─ 💰 Umsatz: `{revenue}€`"
     )
     
+    SELLER_STATS_TOP = "\n\n🏆 **Top-Produkte (30 Tage):**\n{products}"
+    
+    EXPORT_STARTED = "📤 Export gestartet - die CSV-Dateien (Bestellungen & Lager) kommen gleich als Dokument."
+    EXPORT_RUNNING = "⏳ Es läuft bereits ein Export für deinen Shop. Bitte warte, bis er fertig ist."
+    EXPORT_FAILED = "❌ Export fehlgeschlagen. Bitte später erneut versuchen."
+    EXPORT_ORDERS_CAPTION = "📦 Bestellungen: {count}"
+    EXPORT_STOCK_CAPTION = "🗃 Verfügbare Items: {count} ({products} Produkte)"
+    
     # Master Admin
     MASTER_DASHBOARD = (
         "👑 **System-Admin Dashboard**\n\n"
@@ -67,8 +97,8 @@ class Messages:
         "• `/grantpro <ID>` - PRO aktivieren\n"
         "• `/revokepro <ID>` - PRO entfernen\n"
         "• `/userinfo <ID>` - User-Details\n"
-        "• `/listpro` - Alle PRO-User anzeigen\n"
-        "• `/listfree` - Alle FREE-User anzeigen"
+        "• `/listpro [Suche]` - PRO-User anzeigen\n"
+        "• `/listfree [Suche]` - FREE-User anzeigen"
     )
     
     # Produkt Management
@@ -77,9 +107,22 @@ class Messages:
     ASK_PRODUCT_PRICE = "💰 Was soll es kosten? (z.B. 12.50)"
     ASK_PRODUCT_CATEGORY = "📁 In welche Kategorie soll das Produkt? (Kategorie-Name)"
     ASK_PRODUCT_IMAGE = "🖼 Sende jetzt ein Bild für dieses Produkt (oder überspringe):"
-    STOCK_REFILL_PROMPT = "📥 Sende die neuen Daten (eine pro Zeile):\n\nBeispiel:\nkey1:value1\nkey2:value2"
+    STOCK_REFILL_PROMPT = (
+        "📥 Sende die neuen Daten (eine pro Zeile):\n\nBeispiel:\nkey1:value1\nkey2:value2\n\n"
+        "📎 Viele Items? Lade eine **.txt** (ein Item pro Zeile) oder **.csv** hoch. "
+        "Bei CSV wählst du die Spalte per Bildunterschrift (Nummer oder Spaltenname, Standard: 1. Spalte)."
+    )
     PRODUCT_ADDED = "✅ Produkt **{name}** wurde erfolgreich erstellt!"
     REFILL_SUCCESS = "✅ `{count}` Einheiten wurden hinzugefügt!"
+    FSM_DATA_TOO_LARGE = "⚠️ Eingabe zu groß - bitte kürzer fassen oder als Datei hochladen."
+    PRODUCT_NOT_FOUND = "❌ Produkt nicht gefunden - wurde es inzwischen gelöscht?"
+    DUPLICATES_SKIPPED = "\n⏭ `{count}` doppelte Einheiten übersprungen (bereits im Lager oder verkauft)."
+    IMPORT_STARTED = "⏳ Datei wird importiert..."
+    IMPORT_PROGRESS = "⏳ Import läuft...\n\n📄 Gelesen: `{read}`\n✅ Hinzugefügt: `{added}`\n⏭ Übersprungen: `{skipped}`"
+    IMPORT_DONE = "✅ **Import abgeschlossen**\n\n📄 Gelesen: `{read}`\n✅ Hinzugefügt: `{added}`\n⏭ Übersprungen: `{skipped}`"
+    IMPORT_FAILED = "❌ Import abgebrochen - `{added}` Einheiten wurden bereits hinzugefügt. Bitte Datei prüfen und Rest erneut hochladen."
+    IMPORT_TOO_LARGE = "⚠️ Datei zu groß (max. {max_mb} MB). Bitte in mehrere Dateien aufteilen."
+    IMPORT_BAD_TYPE = "⚠️ Bitte eine .txt- oder .csv-Datei senden."
     LIMIT_REACHED = (
         "⚠️ **Limit erreicht!**\n\n"
         "Im FREE-Modus kannst du maximal **2 Produkte** anlegen.\n"
@@ -129,6 +172,9 @@ class Messages:
     # Zahlungen & Shop (Kundensicht)
     SHOP_WELCOME = "🏪 **Willkommen im Shop von {owner_name}**\n\nDurchstöbere die verfügbaren Produkte:"
     CATALOG_EMPTY = "📭 Dieser Shop hat aktuell keine Produkte im Angebot."
+    CATALOG_CATEGORY_HEADER = "📁 **Kategorie: {category}**"
+    CATALOG_SEPARATOR = "\n\n━━━━━━━━━━━━\n\n"
+    ADMIN_PRODUCTS_HEADER = "📋 **Meine Produkte** ({count})"
     
     PRODUCT_DETAILS = (
         "📦 **{name}**\n\n"
@@ -147,7 +193,7 @@ class Messages:
     
     ORDER_INITIATED = (
         "✅ **Bestellung eingeleitet!**\n\n"
-        "Bitte sende den Betrag an eine der folgenden Adressen:\n\n"
+        "Bitte sende **{price}€** an eine der folgenden Adressen:\n\n"
         "{payment_methods}\n\n"
         "Sobald der Verkäufer die Zahlung bestätigt, erhältst du die Ware automatisch."
     )
@@ -168,8 +214,13 @@ class Messages:
         "Bestätige die Zahlung, um die Ware auszuliefern."
     )
     
-    SALE_CONFIRMED_SELLER = "✅ **Verkauf abgeschlossen!**\nWare gesendet:\n`{content}`"
-    SALE_CONFIRMED_BUYER = "🎉 **Zahlung bestätigt!**\n\nDeine Ware:\n`{content}`"
+    SALE_CONFIRMED_SELLER = "✅ **Verkauf abgeschlossen!**\n📦 {product_name}\nWare gesendet:\n`{content}`"
+    SALE_CONFIRMED_BUYER = "🎉 **Zahlung bestätigt!**\n\n📦 {product_name}\nDeine Ware:\n`{content}`"
+    SALE_DELIVERY_FAILED_SELLER = (
+        "⚠️ **Verkauf abgeschlossen, Zustellung fehlgeschlagen!**\n"
+        "📦 {product_name}\nWare:\n`{content}`\n\n"
+        "Bitte sende die Ware selbst an den Käufer oder tippe erneut auf Bestätigen."
+    )
     
     # Upgrade / Pro
     UPGRADE_INFO = (
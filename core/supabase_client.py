@@ -1,10 +1,28 @@
-from supabase import create_client, Client
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from supabase import create_client, Client, ClientOptions  # Sync-Variante (supabase >= 2.8)
 from config import Config
 
 def get_supabase() -> Client:
     if not Config.SUPABASE_URL or not Config.SUPABASE_KEY:
         raise ValueError("❌ Supabase URL oder Key fehlen in den Umgebungsvariablen!")
-    
-    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+
+    # Ein Client = eine gepoolte HTTP/2-Session (httpx), geteilt von allen Threads
+    options = ClientOptions(postgrest_client_timeout=Config.DB_TIMEOUT)
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=options)
 
 db = get_supabase()
+
+# Begrenzter Thread-Pool für die synchronen PostgREST-Requests
+_db_executor = ThreadPoolExecutor(
+    max_workers=Config.DB_MAX_WORKERS,
+    thread_name_prefix="supabase"
+)
+
+async def run_query(query):
+    """
+    Führt eine Supabase-Query aus, ohne den Event-Loop zu blockieren.
+    Das HTTP-Request läuft im Thread-Pool, alle Bots pollen währenddessen weiter.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, query.execute)
@@ -0,0 +1,49 @@
+"""
+Telegram HTTP-Session
+Eine gemeinsame aiohttp-Session (ein Connection-Pool) für alle Bot-Instanzen
+"""
+from typing import Optional
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from config import Config
+from services.send_scheduler import send_scheduler
+
+_shared_session: Optional[AiohttpSession] = None
+
+
+def get_shared_session() -> AiohttpSession:
+    """
+    Gemeinsame Session (wird beim ersten Aufruf erstellt)
+    Der Send-Scheduler ist genau einmal als Request-Middleware registriert
+    """
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = AiohttpSession(
+            limit=Config.TELEGRAM_POOL_LIMIT,
+            timeout=Config.TELEGRAM_REQUEST_TIMEOUT
+        )
+        _shared_session.middleware(send_scheduler)
+    return _shared_session
+
+
+def create_bot(token: str) -> Bot:
+    """
+    Bot-Instanz auf der gemeinsamen Session
+    Wichtig: bot.session.close() nie aufrufen - das schließt den Pool für alle Bots
+    """
+    return Bot(
+        token=token,
+        session=get_shared_session(),
+        default=DefaultBotProperties(parse_mode="HTML")
+    )
+
+
+async def close_shared_session():
+    """
+    Session schließen (nur beim Shutdown)
+    """
+    global _shared_session
+    if _shared_session is not None:
+        await _shared_session.close()
+        _shared_session = None
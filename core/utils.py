@@ -1,25 +1,16 @@
-import httpx
-from services.db_service import db
+from typing import Dict, Optional
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from core.supabase_client import db, run_query
 
 async def get_user_id_by_shop_id(shop_id: str):
     """Shop-ID zu Telegram-User-ID auflösen"""
     try:
-        response = db.table("profiles").select("id").eq("shop_id", shop_id.upper()).single().execute()
+        response = await run_query(db.table("profiles").select("id").eq("shop_id", shop_id.upper()).single())
         return response.data["id"] if response.data else None
     except:
         return None
 
-async def get_ltc_price(eur_amount: float):
-    """EUR zu LTC Kurs holen"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api.coinbase.com/v2/prices/LTC-EUR/spot")
-            data = response.json()
-            price = float(data["data"]["amount"])
-            return round(eur_amount / price, 8)
-    except:
-        return None
-
 def validate_crypto_address(address: str, method: str) -> bool:
     """Validiert Krypto-Adressen und PayPal E-Mail"""
     address = address.strip()
@@ -52,26 +43,41 @@ def format_stock_display(content: str) -> int:
     items = [i for i in content.split("\n") if i.strip()]
     return len(items)
 
-def format_payment_methods(user_data: dict, is_pro: bool) -> str:
-    """Formatiert Zahlungsmethoden für Anzeige"""
+# Wallet-Feld -> Krypto-Asset
+WALLET_ASSETS = {
+    "wallet_btc": "BTC",
+    "wallet_ltc": "LTC",
+    "wallet_eth": "ETH",
+    "wallet_sol": "SOL"
+}
+
+def get_payment_fields(user_data: dict, is_pro: bool) -> list:
+    """Hinterlegte Zahlungsmethoden (FREE: nur BTC & LTC)"""
     from config import Config
     
-    methods = []
-    
-    # BTC & LTC (immer verfügbar)
-    if user_data.get("wallet_btc"):
-        methods.append(f"₿ **BTC:** `{user_data['wallet_btc']}`")
-    if user_data.get("wallet_ltc"):
-        methods.append(f"Ł **LTC:** `{user_data['wallet_ltc']}`")
+    allowed = Config.PRO_PAYMENT_METHODS if is_pro else Config.FREE_PAYMENT_METHODS
+    return [field for field in allowed if user_data.get(field)]
+
+def format_payment_methods(user_data: dict, is_pro: bool, amounts: Optional[Dict[str, float]] = None) -> str:
+    """Formatiert Zahlungsmethoden für Anzeige (optional mit Krypto-Beträgen)"""
+    labels = {
+        "wallet_btc": "₿ **BTC:**",
+        "wallet_ltc": "Ł **LTC:**",
+        "wallet_eth": "Ξ **ETH:**",
+        "wallet_sol": "◎ **SOL:**",
+        "paypal_email": "🅿️ **PayPal (F&F):**"
+    }
     
-    # Nur PRO: ETH, SOL, PayPal
-    if is_pro:
-        if user_data.get("wallet_eth"):
-            methods.append(f"Ξ **ETH:** `{user_data['wallet_eth']}`")
-        if user_data.get("wallet_sol"):
-            methods.append(f"◎ **SOL:** `{user_data['wallet_sol']}`")
-        if user_data.get("paypal_email"):
-            methods.append(f"🅿️ **PayPal (F&F):** `{user_data['paypal_email']}`")
+    methods = []
+    for field in get_payment_fields(user_data, is_pro):
+        line = f"{labels[field]} `{user_data[field]}`"
+        
+        asset = WALLET_ASSETS.get(field)
+        if amounts and asset in amounts:
+            amount = f"{amounts[asset]:.8f}".rstrip("0").rstrip(".")
+            line += f"\n   💰 Betrag: `{amount} {asset}`"
+        
+        methods.append(line)
     
     return "\n".join(methods) if methods else "Keine Zahlungsmethoden hinterlegt"
 
@@ -89,3 +95,88 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     if len(text) <= max_length:
         return text
     return text[:max_length] + "..."
+
+
+def paginate(items: list, page: int, page_size: int) -> tuple[list, int, int]:
+    """
+    Schneidet eine Seite aus einer Liste
+    Returns: (page_items, page, total_pages) - page wird auf den gültigen Bereich begrenzt
+    """
+    total_pages = max(1, -(-len(items) // page_size))
+    page = min(max(page, 0), total_pages - 1)
+    start = page * page_size
+    return items[start:start + page_size], page, total_pages
+
+
+def build_page_nav(make_callback, page: int, total_pages: int) -> list:
+    """
+    Navigationszeile (◀️ x/y ▶️) für blätterbare Ansichten
+    make_callback: page -> callback_data
+    """
+    from core.strings import Buttons
+    
+    row = []
+    if page > 0:
+        row.append(types.InlineKeyboardButton(
+            text=Buttons.PREV_PAGE,
+            callback_data=make_callback(page - 1)
+        ))
+    row.append(types.InlineKeyboardButton(
+        text=Buttons.PAGE_INFO.format(page=page + 1, total=total_pages),
+        callback_data="noop"
+    ))
+    if page < total_pages - 1:
+        row.append(types.InlineKeyboardButton(
+            text=Buttons.NEXT_PAGE,
+            callback_data=make_callback(page + 1)
+        ))
+    return row
+
+
+async def show_view(
+    message: types.Message,
+    text: str,
+    reply_markup: types.InlineKeyboardMarkup = None,
+    image: str = None,
+    edit: bool = False
+):
+    """
+    Zeigt eine Ansicht als eine einzige Nachricht.
+    edit=True: bestehende Nachricht ersetzen (edit_text / edit_media),
+    nur bei Wechsel zwischen Text und Bild wird neu gesendet.
+    """
+    if edit:
+        try:
+            if image and message.photo:
+                await message.edit_media(
+                    types.InputMediaPhoto(media=image, caption=text, parse_mode="Markdown"),
+                    reply_markup=reply_markup
+                )
+                return
+            if not image and not message.photo:
+                await message.edit_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+                return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+        
+        # Text <-> Bild lässt sich nicht bearbeiten: alte Nachricht ersetzen
+        try:
+            await message.delete()
+        except Exception:
+            pass
+    
+    if image:
+        try:
+            await message.answer_photo(
+                photo=image,
+                caption=text,
+                reply_markup=reply_markup,
+                parse_mode="Markdown"
+            )
+            return
+        except Exception:
+            # Fallback ohne Bild
+            pass
+    
+    await message.answer(text, reply_markup=reply_markup, parse_mode="Markdown")
@@ -1,4 +1,5 @@
-from core.supabase_client import db
+from core.supabase_client import db, run_query
+from services.db_service import get_user_by_id
 from config import Config
 
 async def can_add_product(telegram_id: int) -> tuple[bool, str]:
@@ -6,19 +7,17 @@ async def can_add_product(telegram_id: int) -> tuple[bool, str]:
     Prüft ob User noch Produkte hinzufügen darf
     Returns: (can_add: bool, reason: str)
     """
-    user_response = db.table("profiles").select("is_pro").eq("id", telegram_id).execute()
+    user = await get_user_by_id(telegram_id)
     
-    if not user_response.data:
+    if not user:
         return False, "User nicht gefunden"
     
-    user = user_response.data[0]
-    
     # PRO: Unbegrenzt
     if user.get("is_pro"):
         return True, ""
     
     # FREE: Max 2 Produkte
-    products_response = db.table("products").select("id", count="exact").eq("owner_id", telegram_id).execute()
+    products_response = await run_query(db.table("products").select("id", count="exact").eq("owner_id", telegram_id))
     product_count = products_response.count if products_response.count is not None else 0
     
     if product_count >= Config.FREE_PRODUCT_LIMIT:
@@ -28,17 +27,17 @@ async def can_add_product(telegram_id: int) -> tuple[bool, str]:
 
 async def can_use_categories(telegram_id: int) -> bool:
     """Prüft ob User Kategorien nutzen darf (PRO-Feature)"""
-    user_response = db.table("profiles").select("is_pro").eq("id", telegram_id).execute()
-    if not user_response.data:
+    user = await get_user_by_id(telegram_id)
+    if not user:
         return False
-    return user_response.data[0].get("is_pro", False)
+    return user.get("is_pro", False)
 
 async def can_upload_images(telegram_id: int) -> bool:
     """Prüft ob User Bilder hochladen darf (PRO-Feature)"""
-    user_response = db.table("profiles").select("is_pro").eq("id", telegram_id).execute()
-    if not user_response.data:
+    user = await get_user_by_id(telegram_id)
+    if not user:
         return False
-    return user_response.data[0].get("is_pro", False)
+    return user.get("is_pro", False)
 
 async def can_use_payment_method(telegram_id: int, method: str) -> bool:
     """
@@ -46,11 +45,11 @@ async def can_use_payment_method(telegram_id: int, method: str) -> bool:
     FREE: Nur BTC & LTC
     PRO: Alle
     """
-    user_response = db.table("profiles").select("is_pro").eq("id", telegram_id).execute()
-    if not user_response.data:
+    user = await get_user_by_id(telegram_id)
+    if not user:
         return False
     
-    is_pro = user_response.data[0].get("is_pro", False)
+    is_pro = user.get("is_pro", False)
     
     # FREE: Nur BTC & LTC
     if not is_pro:
@@ -20,6 +20,9 @@ CREATE TABLE IF NOT EXISTS profiles (
     -- PRO Features
     custom_bot_token TEXT UNIQUE,
     expiry_date TIMESTAMPTZ,
+    bot_id BIGINT,  -- Bot-Identität (beim ersten Start per getMe ermittelt)
+    bot_username TEXT,
+    bot_name TEXT,
     
     -- Migration
     migration_completed BOOLEAN DEFAULT FALSE,
@@ -39,7 +42,8 @@ CREATE TABLE IF NOT EXISTS products (
     name TEXT NOT NULL,
     description TEXT,
     price DECIMAL(10, 2) NOT NULL,
-    content TEXT,  -- Lagerbestand (eine Zeile pro Item)
+    content TEXT,  -- Veraltet: Lagerbestand liegt in stock_items
+    stock_count INTEGER NOT NULL DEFAULT 0,  -- Verfügbare Items (per Trigger gepflegt)
     
     -- PRO Features
     category TEXT,  -- Nur PRO: Kategorie-Name
@@ -59,6 +63,7 @@ CREATE TABLE IF NOT EXISTS orders (
     product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
     seller_id BIGINT NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
     status TEXT DEFAULT 'pending',  -- pending, completed, cancelled
+    price DECIMAL(10, 2),  -- Preis zum Bestellzeitpunkt (per Trigger aus products)
     
     -- Timestamps
     created_at TIMESTAMPTZ DEFAULT NOW(),
@@ -78,14 +83,102 @@ CREATE TABLE IF NOT EXISTS categories (
     UNIQUE(owner_id, name)
 );
 
+-- ========================================
+-- STOCK ITEMS TABELLE (ein Eintrag pro Lager-Item)
+-- ========================================
+CREATE TABLE IF NOT EXISTS stock_items (
+    id BIGSERIAL PRIMARY KEY,
+    product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    status TEXT DEFAULT 'available',  -- available, sold
+    order_id UUID REFERENCES orders(id) ON DELETE SET NULL,  -- Bestellung, die das Item erhalten hat
+    content_hash BYTEA,  -- md5(content) per Trigger, eindeutig pro Produkt (Duplikat-Erkennung)
+    
+    -- Timestamps
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    sold_at TIMESTAMPTZ
+);
+
+-- ========================================
+-- BOT WORKER & LEASES (Worker-Modus: Shop-Bots auf mehrere Prozesse verteilt)
+-- ========================================
+CREATE TABLE IF NOT EXISTS bot_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS bot_leases (
+    owner_id BIGINT PRIMARY KEY REFERENCES profiles(id) ON DELETE CASCADE,  -- Shop-Besitzer (1 Bot pro Shop)
+    worker_id TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    acquired_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Bestehende Installationen: Zähler-Spalte nachrüsten
+ALTER TABLE products ADD COLUMN IF NOT EXISTS stock_count INTEGER NOT NULL DEFAULT 0;
+
+-- ========================================
+-- VERKAUFS-ROLLUPS (pro Tag, per Trigger auf orders gepflegt)
+-- ========================================
+CREATE TABLE IF NOT EXISTS sales_daily (
+    seller_id BIGINT NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,  -- Neue Bestellungen an diesem Tag
+    completed INTEGER NOT NULL DEFAULT 0,  -- An diesem Tag bestätigte Verkäufe
+    cancelled INTEGER NOT NULL DEFAULT 0,  -- An diesem Tag stornierte Bestellungen
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,  -- Umsatz der bestätigten Verkäufe
+    
+    PRIMARY KEY (seller_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    seller_id BIGINT NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    
+    PRIMARY KEY (product_id, day)
+);
+
+-- Bestehende Installationen: Storno-Zähler nachrüsten
+ALTER TABLE sales_daily ADD COLUMN IF NOT EXISTS cancelled INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE product_sales_daily ADD COLUMN IF NOT EXISTS cancelled INTEGER NOT NULL DEFAULT 0;
+
+-- Bestehende Installationen: Bestellpreis nachrüsten
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS price DECIMAL(10, 2);
+
+-- Bestehende Installationen: Item-Fingerprint nachrüsten
+ALTER TABLE stock_items ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+
+-- Bestehende Installationen: Bot-Identität nachrüsten
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS bot_id BIGINT;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS bot_username TEXT;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS bot_name TEXT;
+
 -- ========================================
 -- INDIZES für Performance
 -- ========================================
 CREATE INDEX IF NOT EXISTS idx_products_owner ON products(owner_id);
+CREATE INDEX IF NOT EXISTS idx_products_owner_category ON products(owner_id, category);
 CREATE INDEX IF NOT EXISTS idx_orders_seller ON orders(seller_id);
+CREATE INDEX IF NOT EXISTS idx_orders_seller_created ON orders(seller_id, created_at, id);  -- Keyset-Export
 CREATE INDEX IF NOT EXISTS idx_orders_buyer ON orders(buyer_id);
+CREATE INDEX IF NOT EXISTS idx_product_sales_daily_seller ON product_sales_daily(seller_id, day);
 CREATE INDEX IF NOT EXISTS idx_profiles_shop_id ON profiles(shop_id);
 CREATE INDEX IF NOT EXISTS idx_profiles_token ON profiles(custom_bot_token);
+CREATE INDEX IF NOT EXISTS idx_stock_items_available ON stock_items(product_id, id) WHERE status = 'available';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_items_order ON stock_items(order_id) WHERE order_id IS NOT NULL;  -- Max. 1 Item pro Bestellung
+CREATE INDEX IF NOT EXISTS idx_bot_leases_worker ON bot_leases(worker_id);
+CREATE INDEX IF NOT EXISTS idx_profiles_pro_expiry ON profiles(expiry_date) WHERE is_pro;
+CREATE INDEX IF NOT EXISTS idx_profiles_pro_id ON profiles(is_pro, id);  -- Keyset-Listen (/listpro, /listfree)
+
+-- Username-Suche (ILIKE '%...%') über Trigramm-Index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_profiles_username_trgm ON profiles USING gin (username gin_trgm_ops);
 
 -- ========================================
 -- RLS (Row Level Security) - Optional aber empfohlen
@@ -129,3 +222,600 @@ CREATE TRIGGER update_products_updated_at BEFORE UPDATE ON products
 
 CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- ========================================
+-- TRIGGER für products.stock_count
+-- ========================================
+-- Hält den Zähler bei jedem Insert/Update/Delete in stock_items exakt
+-- (ein UPDATE pro Statement und Produkt, auch bei Batch-Inserts)
+CREATE OR REPLACE FUNCTION stock_items_count_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE products p
+    SET stock_count = p.stock_count + c.n
+    FROM (
+        SELECT product_id, COUNT(*) AS n FROM new_rows
+        WHERE status = 'available' GROUP BY product_id
+    ) c
+    WHERE p.id = c.product_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stock_items_count_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE products p
+    SET stock_count = p.stock_count + c.delta
+    FROM (
+        SELECT n.product_id,
+               SUM((n.status = 'available')::int - (o.status = 'available')::int) AS delta
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        GROUP BY n.product_id
+    ) c
+    WHERE p.id = c.product_id AND c.delta <> 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stock_items_count_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE products p
+    SET stock_count = p.stock_count - c.n
+    FROM (
+        SELECT product_id, COUNT(*) AS n FROM old_rows
+        WHERE status = 'available' GROUP BY product_id
+    ) c
+    WHERE p.id = c.product_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stock_items_count_ins ON stock_items;
+CREATE TRIGGER stock_items_count_ins AFTER INSERT ON stock_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stock_items_count_insert();
+
+DROP TRIGGER IF EXISTS stock_items_count_upd ON stock_items;
+CREATE TRIGGER stock_items_count_upd AFTER UPDATE ON stock_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stock_items_count_update();
+
+DROP TRIGGER IF EXISTS stock_items_count_del ON stock_items;
+CREATE TRIGGER stock_items_count_del AFTER DELETE ON stock_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stock_items_count_delete();
+
+-- ========================================
+-- TRIGGER für stock_items.content_hash
+-- ========================================
+-- Fingerprint (16 Bytes) für den Unique-Index (product_id, content_hash):
+-- INSERT ... ON CONFLICT DO NOTHING verwirft doppelte Items per Index-Lookup
+CREATE OR REPLACE FUNCTION stock_items_set_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.content_hash := decode(md5(NEW.content), 'hex');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stock_items_hash ON stock_items;
+CREATE TRIGGER stock_items_hash BEFORE INSERT OR UPDATE OF content ON stock_items
+    FOR EACH ROW EXECUTE FUNCTION stock_items_set_hash();
+
+-- ========================================
+-- VERKAUFS-ROLLUPS: Trigger auf orders
+-- ========================================
+-- Preis beim Anlegen aus dem Produkt übernehmen
+CREATE OR REPLACE FUNCTION orders_set_price()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.price IS NULL THEN
+        SELECT price INTO NEW.price FROM products WHERE id = NEW.product_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_price ON orders;
+CREATE TRIGGER orders_price BEFORE INSERT ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_set_price();
+
+-- Rollup-Tage werden immer in UTC geschnitten (unabhängig von der Session-Zeitzone)
+CREATE OR REPLACE FUNCTION utc_today()
+RETURNS DATE AS $$
+    SELECT (now() AT TIME ZONE 'UTC')::DATE;
+$$ LANGUAGE sql STABLE;
+
+-- Zähler in sales_daily & product_sales_daily fortschreiben
+DROP FUNCTION IF EXISTS bump_sales(BIGINT, BIGINT, DATE, INTEGER, INTEGER, DECIMAL);
+CREATE OR REPLACE FUNCTION bump_sales(
+    p_seller_id BIGINT, p_product_id BIGINT, p_day DATE,
+    p_orders INTEGER, p_completed INTEGER, p_cancelled INTEGER, p_revenue DECIMAL
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO sales_daily (seller_id, day, orders, completed, cancelled, revenue)
+    VALUES (p_seller_id, p_day, p_orders, p_completed, p_cancelled, p_revenue)
+    ON CONFLICT (seller_id, day) DO UPDATE
+    SET orders = sales_daily.orders + EXCLUDED.orders,
+        completed = sales_daily.completed + EXCLUDED.completed,
+        cancelled = sales_daily.cancelled + EXCLUDED.cancelled,
+        revenue = sales_daily.revenue + EXCLUDED.revenue;
+
+    INSERT INTO product_sales_daily (product_id, day, seller_id, orders, completed, cancelled, revenue)
+    VALUES (p_product_id, p_day, p_seller_id, p_orders, p_completed, p_cancelled, p_revenue)
+    ON CONFLICT (product_id, day) DO UPDATE
+    SET orders = product_sales_daily.orders + EXCLUDED.orders,
+        completed = product_sales_daily.completed + EXCLUDED.completed,
+        cancelled = product_sales_daily.cancelled + EXCLUDED.cancelled,
+        revenue = product_sales_daily.revenue + EXCLUDED.revenue;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statuswechsel als Differenz verbuchen (auch Rücknahmen von completed/cancelled)
+CREATE OR REPLACE FUNCTION orders_rollup()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_completed INTEGER;
+    v_cancelled INTEGER;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_completed := COALESCE((NEW.status = 'completed')::INT, 0);
+        v_cancelled := COALESCE((NEW.status = 'cancelled')::INT, 0);
+        PERFORM bump_sales(NEW.seller_id, NEW.product_id, utc_today(), 1, v_completed, v_cancelled,
+                           v_completed * COALESCE(NEW.price, 0));
+    ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+        v_completed := COALESCE((NEW.status = 'completed')::INT, 0) - COALESCE((OLD.status = 'completed')::INT, 0);
+        v_cancelled := COALESCE((NEW.status = 'cancelled')::INT, 0) - COALESCE((OLD.status = 'cancelled')::INT, 0);
+        IF v_completed <> 0 OR v_cancelled <> 0 THEN
+            PERFORM bump_sales(NEW.seller_id, NEW.product_id, utc_today(), 0, v_completed, v_cancelled,
+                               v_completed * COALESCE(NEW.price, 0));
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_rollup_ins ON orders;
+CREATE TRIGGER orders_rollup_ins AFTER INSERT ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_rollup();
+
+DROP TRIGGER IF EXISTS orders_rollup_upd ON orders;
+CREATE TRIGGER orders_rollup_upd AFTER UPDATE OF status ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_rollup();
+
+-- ========================================
+-- STOCK: Item atomar einer Bestellung zuteilen
+-- ========================================
+-- Gibt genau ein Item pro Bestellung aus (NULL = ausverkauft).
+-- Wiederholte Aufrufe für dieselbe Bestellung liefern dasselbe Item.
+CREATE OR REPLACE FUNCTION claim_stock_item(p_product_id BIGINT, p_order_id UUID)
+RETURNS TEXT AS $$
+DECLARE
+    v_content TEXT;
+BEGIN
+    SELECT content INTO v_content FROM stock_items WHERE order_id = p_order_id;
+    IF FOUND THEN
+        RETURN v_content;
+    END IF;
+
+    UPDATE stock_items
+    SET status = 'sold', order_id = p_order_id, sold_at = NOW()
+    WHERE id = (
+        SELECT id FROM stock_items
+        WHERE product_id = p_product_id AND status = 'available'
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING content INTO v_content;
+
+    RETURN v_content;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ========================================
+-- ORDER: Bestätigung in einer Transaktion (RPC)
+-- ========================================
+-- Sperrt Bestellung und Produkt, teilt das nächste Item zu und markiert
+-- die Bestellung als abgeschlossen. Parallele Klicks warten auf die Sperre
+-- und erhalten danach 'already_completed' - nie ein zweites Item.
+-- status: completed | sold_out | already_completed | not_found
+CREATE OR REPLACE FUNCTION confirm_order_tx(p_order_id UUID, p_seller_id BIGINT)
+RETURNS JSONB AS $$
+DECLARE
+    v_order orders%ROWTYPE;
+    v_product products%ROWTYPE;
+    v_item TEXT;
+BEGIN
+    SELECT * INTO v_order FROM orders WHERE id = p_order_id FOR UPDATE;
+    IF NOT FOUND OR v_order.seller_id <> p_seller_id THEN
+        RETURN jsonb_build_object('status', 'not_found');
+    END IF;
+
+    IF v_order.status = 'completed' THEN
+        -- Bereits zugeteiltes Item mitliefern (erneutes Senden, z.B. nach Zustellfehler)
+        RETURN jsonb_build_object(
+            'status', 'already_completed',
+            'item', (SELECT content FROM stock_items WHERE order_id = p_order_id),
+            'product_name', (SELECT name FROM products WHERE id = v_order.product_id),
+            'buyer_id', v_order.buyer_id
+        );
+    END IF;
+
+    SELECT * INTO v_product FROM products WHERE id = v_order.product_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'not_found');
+    END IF;
+
+    v_item := claim_stock_item(v_product.id, p_order_id);
+    IF v_item IS NULL THEN
+        RETURN jsonb_build_object(
+            'status', 'sold_out',
+            'product_name', v_product.name,
+            'buyer_id', v_order.buyer_id
+        );
+    END IF;
+
+    UPDATE orders SET status = 'completed' WHERE id = p_order_id;
+
+    RETURN jsonb_build_object(
+        'status', 'completed',
+        'item', v_item,
+        'product_id', v_product.id,
+        'product_name', v_product.name,
+        'buyer_id', v_order.buyer_id,
+        'seller_id', v_order.seller_id
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- ========================================
+-- STOREFRONT: Shop-Ansicht in einem Aufruf (RPC)
+-- ========================================
+-- Liefert Profil-Felder, Produktliste inkl. Lagerbestand und die Anzahl
+-- Produkte pro Kategorie. profile = NULL, wenn der Shop nicht existiert.
+-- Kategorie per ID (callback_data bleibt kurz, Telegram erlaubt max. 64 Bytes)
+DROP FUNCTION IF EXISTS get_storefront(BIGINT, TEXT);
+CREATE OR REPLACE FUNCTION get_storefront(p_owner_id BIGINT, p_category_id INTEGER DEFAULT NULL)
+RETURNS JSONB AS $$
+    WITH cat AS (
+        SELECT name FROM categories WHERE id = p_category_id AND owner_id = p_owner_id
+    )
+    SELECT jsonb_build_object(
+        'profile', (
+            SELECT jsonb_build_object(
+                'id', pr.id,
+                'username', pr.username,
+                'is_pro', pr.is_pro,
+                'shop_id', pr.shop_id
+            )
+            FROM profiles pr WHERE pr.id = p_owner_id
+        ),
+        'category', (SELECT name FROM cat),
+        'products', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', p.id,
+                'name', p.name,
+                'description', p.description,
+                'price', p.price,
+                'category', p.category,
+                'image_url', p.image_url,
+                'stock_count', p.stock_count
+            ) ORDER BY p.created_at DESC)
+            FROM products p
+            WHERE p.owner_id = p_owner_id
+              AND (p_category_id IS NULL OR p.category = (SELECT name FROM cat))
+        ), '[]'::jsonb),
+        'categories', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', c.id,
+                'name', c.name,
+                'product_count', (
+                    SELECT COUNT(*) FROM products p
+                    WHERE p.owner_id = p_owner_id AND p.category = c.name
+                )
+            ) ORDER BY c.id)
+            FROM categories c WHERE c.owner_id = p_owner_id
+        ), '[]'::jsonb)
+    );
+$$ LANGUAGE sql STABLE;
+
+-- ========================================
+-- LEASES: Heartbeat, Verlängerung & faire Verteilung (RPC)
+-- ========================================
+-- Jeder Worker ruft dies periodisch auf und erhält alle Shop-IDs, deren
+-- Lease er hält. Leases toter Worker laufen ab und werden von den übrigen
+-- übernommen; kommt ein Worker hinzu, gibt jeder seinen Überhang ab
+-- (Anteil pro Worker: ceil(Shops / Worker)).
+-- Darf der Shop-Bot laufen? (PRO, nicht abgelaufen, Token vorhanden)
+-- Abgelaufene Shops fallen so beim nächsten Abgleich auf jedem Worker heraus,
+-- auch bevor der Expiry-Check is_pro zurücksetzt
+CREATE OR REPLACE FUNCTION shop_bot_eligible(p_is_pro BOOLEAN, p_token TEXT, p_expiry TIMESTAMPTZ)
+RETURNS BOOLEAN AS $$
+    SELECT COALESCE(p_is_pro, FALSE)
+       AND p_token IS NOT NULL
+       AND (p_expiry IS NULL OR p_expiry > NOW());
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION sync_bot_leases(p_worker_id TEXT, p_lease_seconds INTEGER)
+RETURNS BIGINT[] AS $$
+DECLARE
+    v_expires TIMESTAMPTZ := NOW() + make_interval(secs => p_lease_seconds);
+    v_workers INTEGER;
+    v_eligible INTEGER;
+    v_share INTEGER;
+    v_held INTEGER;
+BEGIN
+    -- Heartbeat
+    INSERT INTO bot_workers (worker_id, heartbeat_at)
+    VALUES (p_worker_id, NOW())
+    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = NOW();
+
+    -- Tote Worker austragen (ihre Leases laufen von selbst ab)
+    DELETE FROM bot_workers
+    WHERE heartbeat_at < NOW() - make_interval(secs => p_lease_seconds);
+
+    -- Shops ohne PRO (oder abgelaufen) bzw. ohne Token freigeben
+    DELETE FROM bot_leases l
+    WHERE l.worker_id = p_worker_id
+      AND NOT EXISTS (
+          SELECT 1 FROM profiles p
+          WHERE p.id = l.owner_id
+            AND shop_bot_eligible(p.is_pro, p.custom_bot_token, p.expiry_date)
+      );
+
+    -- Eigene Leases verlängern
+    UPDATE bot_leases SET expires_at = v_expires WHERE worker_id = p_worker_id;
+    GET DIAGNOSTICS v_held = ROW_COUNT;
+
+    SELECT COUNT(*) INTO v_workers FROM bot_workers;
+    SELECT COUNT(*) INTO v_eligible FROM profiles
+    WHERE shop_bot_eligible(is_pro, custom_bot_token, expiry_date);
+    v_share := CEIL(v_eligible::NUMERIC / GREATEST(v_workers, 1));
+
+    IF v_held > v_share THEN
+        -- Überhang abgeben (zuletzt übernommene zuerst)
+        DELETE FROM bot_leases
+        WHERE owner_id IN (
+            SELECT owner_id FROM bot_leases
+            WHERE worker_id = p_worker_id
+            ORDER BY acquired_at DESC
+            LIMIT v_held - v_share
+        );
+    ELSIF v_held < v_share THEN
+        -- Freie oder abgelaufene Leases übernehmen
+        INSERT INTO bot_leases (owner_id, worker_id, expires_at)
+        SELECT p.id, p_worker_id, v_expires
+        FROM profiles p
+        LEFT JOIN bot_leases l ON l.owner_id = p.id
+        WHERE shop_bot_eligible(p.is_pro, p.custom_bot_token, p.expiry_date)
+          AND (l.owner_id IS NULL OR l.expires_at < NOW())
+        ORDER BY p.id
+        LIMIT v_share - v_held
+        ON CONFLICT (owner_id) DO UPDATE
+        SET worker_id = EXCLUDED.worker_id,
+            expires_at = EXCLUDED.expires_at,
+            acquired_at = NOW()
+        WHERE bot_leases.expires_at < NOW();
+    END IF;
+
+    RETURN ARRAY(
+        SELECT owner_id FROM bot_leases
+        WHERE worker_id = p_worker_id
+        ORDER BY owner_id
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lease für einen einzelnen Shop sichern (z.B. direkt nach Token-Eingabe).
+-- Gelingt nur für berechtigte Shops, und nur wenn der Shop frei ist, die
+-- Lease abgelaufen ist oder sie bereits diesem Worker gehört.
+CREATE OR REPLACE FUNCTION claim_bot_lease(p_worker_id TEXT, p_owner_id BIGINT, p_lease_seconds INTEGER)
+RETURNS BOOLEAN AS $$
+BEGIN
+    INSERT INTO bot_leases (owner_id, worker_id, expires_at)
+    SELECT p.id, p_worker_id, NOW() + make_interval(secs => p_lease_seconds)
+    FROM profiles p
+    WHERE p.id = p_owner_id
+      AND shop_bot_eligible(p.is_pro, p.custom_bot_token, p.expiry_date)
+    ON CONFLICT (owner_id) DO UPDATE
+    SET worker_id = EXCLUDED.worker_id,
+        expires_at = EXCLUDED.expires_at,
+        acquired_at = NOW()
+    WHERE bot_leases.worker_id = EXCLUDED.worker_id
+       OR bot_leases.expires_at < NOW();
+
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ========================================
+-- SUBSCRIPTIONS: Abgelaufene PRO-Accounts deaktivieren (RPC, Sicherheits-Sweep)
+-- ========================================
+-- Ein UPDATE statt Scan in Python; liefert die IDs der deaktivierten User
+CREATE OR REPLACE FUNCTION expire_pro_subscriptions()
+RETURNS BIGINT[] AS $$
+    WITH expired AS (
+        UPDATE profiles SET is_pro = FALSE
+        WHERE is_pro AND expiry_date < NOW()
+        RETURNING id
+    )
+    SELECT COALESCE(array_agg(id), '{}') FROM expired;
+$$ LANGUAGE sql;
+
+-- ========================================
+-- STATISTIKEN: System-Zähler für das Master-Dashboard (RPC)
+-- ========================================
+-- Nur Zähler, keine Zeilen; Tabellen mit Millionen Zeilen werden über
+-- die Planner-Schätzung gezählt (exakt, solange reltuples < 100000)
+CREATE OR REPLACE FUNCTION estimated_count(p_table REGCLASS)
+RETURNS BIGINT AS $$
+DECLARE
+    v_estimate BIGINT;
+    v_count BIGINT;
+BEGIN
+    SELECT reltuples::BIGINT INTO v_estimate FROM pg_class WHERE oid = p_table;
+    IF v_estimate >= 100000 THEN
+        RETURN v_estimate;
+    END IF;
+    EXECUTE format('SELECT COUNT(*) FROM %s', p_table) INTO v_count;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Gesamtzahlen geschätzt; PRO-User exakt (kleine Menge, über idx_profiles_pro_expiry)
+CREATE OR REPLACE FUNCTION get_system_stats()
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'total_users', GREATEST(u.total, u.pro),
+        'pro_users', u.pro,
+        'free_users', GREATEST(u.total - u.pro, 0),
+        'total_products', estimated_count('products'),
+        'total_orders', estimated_count('orders')
+    )
+    FROM (
+        SELECT estimated_count('profiles') AS total,
+               (SELECT COUNT(*) FROM profiles WHERE is_pro) AS pro
+    ) u;
+$$ LANGUAGE sql STABLE;
+
+-- ========================================
+-- STATISTIKEN: Verkaufsübersicht eines Shops (RPC, liest nur Rollups)
+-- ========================================
+CREATE OR REPLACE FUNCTION get_seller_stats(p_seller_id BIGINT)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'total', COALESCE(SUM(orders), 0),
+        'completed', COALESCE(SUM(completed), 0),
+        'cancelled', COALESCE(SUM(cancelled), 0),
+        'pending', GREATEST(COALESCE(SUM(orders) - SUM(completed) - SUM(cancelled), 0), 0),
+        'revenue', COALESCE(SUM(revenue), 0),
+        'today_completed', COALESCE(SUM(completed) FILTER (WHERE day = utc_today()), 0),
+        'today_revenue', COALESCE(SUM(revenue) FILTER (WHERE day = utc_today()), 0),
+        'week_completed', COALESCE(SUM(completed) FILTER (WHERE day > utc_today() - 7), 0),
+        'week_revenue', COALESCE(SUM(revenue) FILTER (WHERE day > utc_today() - 7), 0),
+        'month_completed', COALESCE(SUM(completed) FILTER (WHERE day > utc_today() - 30), 0),
+        'month_revenue', COALESCE(SUM(revenue) FILTER (WHERE day > utc_today() - 30), 0),
+        'top_products', COALESCE((
+            SELECT jsonb_agg(t ORDER BY t.revenue DESC, t.completed DESC)
+            FROM (
+                SELECT p.name, SUM(s.completed) AS completed, SUM(s.revenue) AS revenue
+                FROM product_sales_daily s
+                JOIN products p ON p.id = s.product_id
+                WHERE s.seller_id = p_seller_id
+                  AND s.day > utc_today() - 30
+                  AND s.completed > 0
+                GROUP BY p.id, p.name
+                ORDER BY SUM(s.revenue) DESC, SUM(s.completed) DESC
+                LIMIT 5
+            ) t
+        ), '[]'::jsonb)
+    )
+    FROM sales_daily
+    WHERE seller_id = p_seller_id;
+$$ LANGUAGE sql STABLE;
+
+-- ========================================
+-- MIGRATION: products.content -> stock_items (einmalig)
+-- ========================================
+-- Überträgt alle Zeilen der alten content-Blobs (Reihenfolge bleibt erhalten)
+-- und leert danach das content-Feld. Mehrfaches Ausführen ist unkritisch.
+CREATE OR REPLACE FUNCTION migrate_product_content_to_stock_items()
+RETURNS BIGINT AS $$
+DECLARE
+    v_count BIGINT;
+BEGIN
+    INSERT INTO stock_items (product_id, content)
+    SELECT p.id, trim(t.item)
+    FROM products p,
+         regexp_split_to_table(p.content, E'\n') WITH ORDINALITY AS t(item, pos)
+    WHERE p.content IS NOT NULL AND trim(t.item) <> ''
+    ORDER BY p.id, t.pos;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+
+    UPDATE products SET content = NULL WHERE content IS NOT NULL;
+
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT migrate_product_content_to_stock_items();
+
+-- Duplikate einmalig bereinigen: verfügbare Items löschen, die schon verkauft
+-- oder früher angelegt wurden; dann Fingerprints nachtragen und Index anlegen.
+-- Bereits doppelt verkaufte Items bleiben erhalten (Auslieferung), behalten
+-- aber nur beim ältesten Eintrag einen Fingerprint.
+DELETE FROM stock_items a
+USING stock_items b
+WHERE a.status = 'available'
+  AND a.product_id = b.product_id
+  AND a.content = b.content
+  AND a.id <> b.id
+  AND (b.status <> 'available' OR b.id < a.id);
+
+UPDATE stock_items s
+SET content_hash = decode(md5(s.content), 'hex')
+FROM (
+    SELECT DISTINCT ON (product_id, md5(content)) id
+    FROM stock_items
+    WHERE content_hash IS NULL
+    ORDER BY product_id, md5(content), id
+) d
+WHERE s.id = d.id
+  AND NOT EXISTS (
+      SELECT 1 FROM stock_items x
+      WHERE x.product_id = s.product_id AND x.content_hash = decode(md5(s.content), 'hex')
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_items_hash ON stock_items(product_id, content_hash);
+
+-- Zähler einmalig aus stock_items neu berechnen
+UPDATE products p
+SET stock_count = (
+    SELECT COUNT(*) FROM stock_items s
+    WHERE s.product_id = p.id AND s.status = 'available'
+);
+
+-- Bestellpreise & Rollups einmalig aus bestehenden Bestellungen füllen
+UPDATE orders o SET price = p.price
+FROM products p
+WHERE o.product_id = p.id AND o.price IS NULL;
+
+INSERT INTO sales_daily (seller_id, day, orders, completed, revenue)
+SELECT seller_id, day, SUM(orders), SUM(completed), SUM(revenue)
+FROM (
+    SELECT seller_id, (created_at AT TIME ZONE 'UTC')::DATE AS day, COUNT(*) AS orders, 0 AS completed, 0 AS revenue
+    FROM orders GROUP BY 1, 2
+    UNION ALL
+    SELECT seller_id, (updated_at AT TIME ZONE 'UTC')::DATE, 0, COUNT(*), COALESCE(SUM(price), 0)
+    FROM orders WHERE status = 'completed' GROUP BY 1, 2
+) t
+GROUP BY seller_id, day
+ON CONFLICT (seller_id, day) DO NOTHING;
+
+INSERT INTO product_sales_daily (product_id, day, seller_id, orders, completed, revenue)
+SELECT product_id, day, MIN(seller_id), SUM(orders), SUM(completed), SUM(revenue)
+FROM (
+    SELECT product_id, seller_id, (created_at AT TIME ZONE 'UTC')::DATE AS day, COUNT(*) AS orders, 0 AS completed, 0 AS revenue
+    FROM orders GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT product_id, seller_id, (updated_at AT TIME ZONE 'UTC')::DATE, 0, COUNT(*), COALESCE(SUM(price), 0)
+    FROM orders WHERE status = 'completed' GROUP BY 1, 2, 3
+) t
+GROUP BY product_id, day
+ON CONFLICT (product_id, day) DO NOTHING;
+
+-- Stornos (Zeitpunkt = updated_at) absolut setzen - mehrfaches Ausführen ist unkritisch
+INSERT INTO sales_daily (seller_id, day, cancelled)
+SELECT seller_id, (updated_at AT TIME ZONE 'UTC')::DATE, COUNT(*)
+FROM orders WHERE status = 'cancelled' GROUP BY 1, 2
+ON CONFLICT (seller_id, day) DO UPDATE SET cancelled = EXCLUDED.cancelled;
+
+INSERT INTO product_sales_daily (product_id, day, seller_id, cancelled)
+SELECT product_id, (updated_at AT TIME ZONE 'UTC')::DATE, MIN(seller_id), COUNT(*)
+FROM orders WHERE status = 'cancelled' GROUP BY 1, 2
+ON CONFLICT (product_id, day) DO UPDATE SET cancelled = EXCLUDED.cancelled;
@@ -1,16 +1,22 @@
 from aiogram import Router, types, F
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from config import Config
 from services.db_service import (
     add_product, get_user_products, delete_product,
-    confirm_order, refill_stock, get_stock_count, get_user_by_id,
+    confirm_order, refill_stock, get_user_by_id,
     get_user_categories, create_category, delete_category,
-    get_product_by_id, update_product
+    update_product, get_seller_stats, get_product_by_id
 )
 from core.validator import can_add_product, can_use_categories, can_upload_images
-from core.utils import upload_image_to_telegram
+from core.utils import upload_image_to_telegram, paginate, build_page_nav, show_view, truncate_text
 from core.strings import Buttons, Messages
+from services.send_scheduler import send_priority, PRIORITY_HIGH
+from services.bot_manager import bot_manager
+from services.export_service import export_service
+from services.stock_import import import_stock_file
 
 router = Router()
 
@@ -63,20 +69,21 @@ async def admin_menu(message: types.Message, is_owner: bool = False):
     is_pro = user.get("is_pro", False)
     shop_id = user.get("shop_id", "Wird generiert...")
     
-    # Bot-Info holen
-    bot_info = await message.bot.get_me()
-    shop_link = f"https://t.me/{bot_info.username}?start={shop_id}"
+    # Bot-Info (gecacht)
+    bot_info = await bot_manager.get_identity(message.bot)
+    shop_link = f"https://t.me/{bot_info['username']}?start={shop_id}"
     
     # Keyboard erstellen
     kb = [
         [types.KeyboardButton(text=Buttons.ADD_PRODUCT)],
         [types.KeyboardButton(text=Buttons.LIST_PRODUCTS)],
+        [types.KeyboardButton(text=Buttons.SALES_STATS)],
         [types.KeyboardButton(text=Buttons.SETTINGS)],
     ]
     
     # PRO: Kategorien-Verwaltung
     if is_pro:
-        kb.insert(2, [types.KeyboardButton(text=Buttons.MANAGE_CATEGORIES)])
+        kb.insert(3, [types.KeyboardButton(text=Buttons.MANAGE_CATEGORIES)])
     
     kb.append([types.KeyboardButton(text=Buttons.MAIN_MENU)])
     
@@ -95,6 +102,50 @@ async def admin_menu(message: types.Message, is_owner: bool = False):
     )
 
 
+# ========================================
+# VERKAUFSSTATISTIK
+# ========================================
+
+@router.message(F.text == Buttons.SALES_STATS)
+@router.message(Command("stats"))
+async def show_sales_stats(message: types.Message):
+    """Umsatz & Verkäufe des eigenen Shops (aus den Tages-Rollups)"""
+    stats = await get_seller_stats(message.from_user.id)
+    
+    text = Messages.SELLER_STATS.format(
+        today_completed=stats.get("today_completed", 0),
+        today_revenue=f"{float(stats.get('today_revenue', 0)):.2f}",
+        week_completed=stats.get("week_completed", 0),
+        week_revenue=f"{float(stats.get('week_revenue', 0)):.2f}",
+        month_completed=stats.get("month_completed", 0),
+        month_revenue=f"{float(stats.get('month_revenue', 0)):.2f}",
+        total=stats.get("total", 0),
+        completed=stats.get("completed", 0),
+        pending=stats.get("pending", 0),
+        cancelled=stats.get("cancelled", 0),
+        revenue=f"{float(stats.get('revenue', 0)):.2f}"
+    )
+    
+    top_products = stats.get("top_products") or []
+    if top_products:
+        text += Messages.SELLER_STATS_TOP.format(products="\n".join(
+            f"{i}. {truncate_text(p['name'], 30)} - `{p['completed']}×` · `{float(p['revenue']):.2f}€`"
+            for i, p in enumerate(top_products, 1)
+        ))
+    
+    await message.answer(text, parse_mode="Markdown")
+
+
+@router.message(Command("export"))
+async def export_shop_data(message: types.Message):
+    """Bestellungen & Lagerbestand als CSV (läuft im Hintergrund)"""
+    if not export_service.enqueue(message.bot, message.chat.id, message.from_user.id):
+        await message.answer(Messages.EXPORT_RUNNING)
+        return
+    
+    await message.answer(Messages.EXPORT_STARTED)
+
+
 # ========================================
 # PRODUKT HINZUFÜGEN
 # ========================================
@@ -293,7 +344,10 @@ async def process_product_content(message: types.Message, state: FSMContext):
     )
     
     await state.clear()
-    await message.answer(Messages.PRODUCT_ADDED.format(name=data['name']))
+    text = Messages.PRODUCT_ADDED.format(name=data['name'])
+    if product and product.get("skipped_items"):
+        text += Messages.DUPLICATES_SKIPPED.format(count=product["skipped_items"])
+    await message.answer(text)
 
 
 # ========================================
@@ -303,17 +357,35 @@ async def process_product_content(message: types.Message, state: FSMContext):
 @router.message(F.text == Buttons.LIST_PRODUCTS)
 async def list_admin_products(message: types.Message):
     """Alle eigenen Produkte auflisten"""
-    user = await get_user_by_id(message.from_user.id)
+    await show_admin_products(message, message.from_user.id)
+
+
+@router.callback_query(F.data.startswith("adminpage_"))
+async def admin_products_page(callback: types.CallbackQuery):
+    """In der Produktliste blättern"""
+    page = int(callback.data.split("_")[1])
+    await show_admin_products(callback.message, callback.from_user.id, page=page, edit=True)
+    await callback.answer()
+
+
+async def show_admin_products(message: types.Message, owner_id: int, page: int = 0, edit: bool = False):
+    """Produktliste als eine blätterbare Nachricht"""
+    user = await get_user_by_id(owner_id)
     is_pro = user.get("is_pro", False)
     
-    products = await get_user_products(message.from_user.id)
+    products = await get_user_products(owner_id)
     
     if not products:
-        await message.answer("Du hast noch keine Produkte angelegt.")
+        await show_view(message, "Du hast noch keine Produkte angelegt.", edit=edit)
         return
     
-    for p in products:
-        stock = await get_stock_count(p['id'])
+    page_size = Config.CATALOG_PAGE_SIZE
+    page_products, page, total_pages = paginate(products, page, page_size)
+    
+    parts = []
+    kb = []
+    for p in page_products:
+        stock = p.get('stock_count', 0)
         
         # Text zusammenstellen
         text = f"📦 **{p['name']}**\n"
@@ -321,44 +393,45 @@ async def list_admin_products(message: types.Message):
         if is_pro and p.get('category'):
             text += f"📁 Kategorie: _{p['category']}_\n"
         
-        text += f"\n{p.get('description', '')}\n"
+        desc = p.get('description') or ''
+        text += f"\n{truncate_text(desc, 200) if page_size > 1 else desc}\n"
         text += f"\n💰 Preis: {p['price']}€\n"
         text += f"🔢 Lager: `{stock}` Stück"
+        parts.append(text)
         
-        # Buttons
-        kb = [
-            [types.InlineKeyboardButton(
-                text=Buttons.REFILL_STOCK,
+        # Buttons pro Produkt
+        kb.append([
+            types.InlineKeyboardButton(
+                text=f"{Buttons.REFILL_STOCK}: {p['name']}",
                 callback_data=f"refill_{p['id']}"
-            )],
-            [types.InlineKeyboardButton(
+            ),
+            types.InlineKeyboardButton(
                 text=Buttons.DELETE_PRODUCT,
-                callback_data=f"delete_{p['id']}"
-            )]
-        ]
-        
-        # Bild falls vorhanden (PRO)
-        if is_pro and p.get('image_url'):
-            try:
-                await message.answer_photo(
-                    photo=p['image_url'],
-                    caption=text,
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb),
-                    parse_mode="Markdown"
-                )
-            except:
-                # Fallback ohne Bild
-                await message.answer(
-                    text,
-                    reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb),
-                    parse_mode="Markdown"
-                )
-        else:
-            await message.answer(
-                text,
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb),
-                parse_mode="Markdown"
+                callback_data=f"delete_{p['id']}_{page}"
             )
+        ])
+    
+    if total_pages > 1:
+        kb.append(build_page_nav(lambda n: f"adminpage_{n}", page, total_pages))
+    
+    text = (
+        Messages.ADMIN_PRODUCTS_HEADER.format(count=len(products))
+        + "\n\n"
+        + Messages.CATALOG_SEPARATOR.join(parts)
+    )
+    
+    # Bild nur bei Einzelprodukt-Seiten (PRO)
+    image = None
+    if is_pro and len(page_products) == 1:
+        image = page_products[0].get('image_url')
+    
+    await show_view(
+        message,
+        text,
+        types.InlineKeyboardMarkup(inline_keyboard=kb),
+        image=image,
+        edit=edit
+    )
 
 
 # ========================================
@@ -375,6 +448,56 @@ async def start_refill(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+@router.message(RefillForm.content, F.document)
+async def process_refill_file(message: types.Message, state: FSMContext):
+    """Lagerbestand aus .txt/.csv-Datei importieren"""
+    data = await state.get_data()
+    pid = data.get('refill_id')
+    document = message.document
+    
+    file_name = (document.file_name or "").lower()
+    if not file_name.endswith((".txt", ".csv")) and document.mime_type not in ("text/plain", "text/csv"):
+        await message.answer(Messages.IMPORT_BAD_TYPE)
+        return
+    
+    if (document.file_size or 0) > Config.STOCK_IMPORT_MAX_BYTES:
+        await message.answer(Messages.IMPORT_TOO_LARGE.format(max_mb=Config.STOCK_IMPORT_MAX_BYTES // (1024 * 1024)))
+        return
+    
+    product = await get_product_by_id(pid) if pid else None
+    if not product or product.get("owner_id") != message.from_user.id:
+        await state.clear()
+        await message.answer(Messages.PRODUCT_NOT_FOUND)
+        return
+    
+    await state.clear()
+    progress = await message.answer(Messages.IMPORT_STARTED)
+    
+    async def on_progress(read: int, added: int, skipped: int):
+        try:
+            await progress.edit_text(
+                Messages.IMPORT_PROGRESS.format(read=read, added=added, skipped=skipped),
+                parse_mode="Markdown"
+            )
+        except Exception:
+            pass  # z.B. "message is not modified"
+    
+    result = await import_stock_file(
+        message.bot,
+        document,
+        pid,
+        message.from_user.id,
+        column=(message.caption or "").strip() or None,
+        on_progress=on_progress
+    )
+    
+    text = Messages.IMPORT_FAILED if result["failed"] else Messages.IMPORT_DONE
+    await progress.edit_text(
+        text.format(read=result["read"], added=result["added"], skipped=result["skipped"]),
+        parse_mode="Markdown"
+    )
+
+
 @router.message(RefillForm.content)
 async def process_refill_content(message: types.Message, state: FSMContext):
     """Lagerbestand hinzufügen"""
@@ -382,8 +505,15 @@ async def process_refill_content(message: types.Message, state: FSMContext):
     pid = data.get('refill_id')
     
     if pid:
-        added = await refill_stock(pid, message.from_user.id, message.text)
-        await message.answer(Messages.REFILL_SUCCESS.format(count=added))
+        result = await refill_stock(pid, message.from_user.id, message.text)
+        if result is None:
+            await message.answer(Messages.PRODUCT_NOT_FOUND)
+        else:
+            added, skipped = result
+            text = Messages.REFILL_SUCCESS.format(count=added)
+            if skipped:
+                text += Messages.DUPLICATES_SKIPPED.format(count=skipped)
+            await message.answer(text)
     
     await state.clear()
 
@@ -395,11 +525,14 @@ async def process_refill_content(message: types.Message, state: FSMContext):
 @router.callback_query(F.data.startswith("delete_"))
 async def process_delete_product(callback: types.CallbackQuery):
     """Produkt löschen"""
-    pid = callback.data.split("_")[1]
+    parts = callback.data.split("_")
+    pid = parts[1]
+    page = int(parts[2]) if len(parts) > 2 else 0
     success = await delete_product(pid, callback.from_user.id)
     
     if success:
-        await callback.message.delete()
+        # Liste an Ort und Stelle aktualisieren
+        await show_admin_products(callback.message, callback.from_user.id, page=page, edit=True)
         await callback.answer("✅ Produkt gelöscht.", show_alert=True)
     else:
         await callback.answer("❌ Fehler beim Löschen.", show_alert=True)
@@ -414,41 +547,61 @@ async def process_confirm_sale(callback: types.CallbackQuery):
     """Zahlung bestätigen & Ware senden"""
     order_id = callback.data.split("_")[1]
     
-    # Order-Daten holen
-    from core.supabase_client import db
-    order = db.table("orders").select("*").eq("id", order_id).single().execute().data
+    # Bestellung abschließen & Item entnehmen (ein DB-Aufruf)
+    result = await confirm_order(order_id, callback.from_user.id)
     
-    if not order:
+    if not result or result["status"] == "not_found":
         await callback.answer("❌ Bestellung nicht gefunden.", show_alert=True)
         return
     
-    # Produkt-Info holen
-    product = await get_product_by_id(order['product_id'])
-    
-    # Item aus Lager nehmen
-    item = await confirm_order(order_id)
+    # Bereits bestätigt: zugeteiltes Item erneut senden (z.B. nach Zustellfehler)
+    if result["status"] == "already_completed" and not result.get("item"):
+        await callback.answer("ℹ️ Diese Bestellung wurde bereits bestätigt.", show_alert=True)
+        return
     
-    if item == "sold_out":
+    if result["status"] == "sold_out":
         await callback.message.answer("❌ **Ausverkauft!**")
         await callback.answer()
         return
     
-    if item:
+    item = result["item"]
+    
+    # Auslieferung hat Vorrang vor Katalog-Nachrichten
+    with send_priority(PRIORITY_HIGH):
         # Ware an Käufer senden
-        await callback.bot.send_message(
-            order['buyer_id'],
-            Messages.SALE_CONFIRMED_BUYER.format(content=item),
-            parse_mode="Markdown"
-        )
+        try:
+            await callback.bot.send_message(
+                result["buyer_id"],
+                Messages.SALE_CONFIRMED_BUYER.format(
+                    product_name=result["product_name"],
+                    content=item
+                ),
+                parse_mode="Markdown"
+            )
+        except TelegramAPIError:
+            # z.B. Käufer hat den Bot blockiert - Item dem Verkäufer zeigen,
+            # Button bleibt für einen erneuten Versuch
+            await show_view(
+                callback.message,
+                Messages.SALE_DELIVERY_FAILED_SELLER.format(
+                    product_name=result["product_name"],
+                    content=item
+                ),
+                reply_markup=callback.message.reply_markup,
+                edit=True
+            )
+            await callback.answer("⚠️ Zustellung fehlgeschlagen!", show_alert=True)
+            return
         
         # Verkäufer benachrichtigen
         await callback.message.edit_text(
-            Messages.SALE_CONFIRMED_SELLER.format(content=item),
+            Messages.SALE_CONFIRMED_SELLER.format(
+                product_name=result["product_name"],
+                content=item
+            ),
             parse_mode="Markdown"
         )
-        await callback.answer("✅ Ware gesendet!")
-    else:
-        await callback.answer("❌ Fehler", show_alert=True)
+    await callback.answer("✅ Ware gesendet!")
 
 
 # ========================================
@@ -1,127 +1,177 @@
+import asyncio
 from aiogram import Router, types, F
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from config import Config
 from services.db_service import (
-    get_user_products, create_order, get_stock_count,
-    get_user_by_id, get_user_categories, get_product_by_id
+    get_storefront, get_cached_catalog_page, cache_catalog_page,
+    create_order,
+    get_user_by_id, get_product_by_id
+)
+from core.utils import (
+    format_payment_methods, get_payment_fields, WALLET_ASSETS,
+    paginate, build_page_nav, show_view, truncate_text
 )
-from core.utils import format_payment_methods
 from core.strings import Buttons, Messages
+from services.send_scheduler import send_priority, PRIORITY_LOW
+from services.price_service import price_service
 
 router = Router()
 
 
-async def show_shop_catalog(message: types.Message, owner_id: int, category: str = None):
+def format_product_text(product: dict, is_pro: bool, short: bool = False) -> str:
+    """Produkt-Text (Katalog); short=True kürzt die Beschreibung für Listen-Seiten"""
+    stock_count = product.get('stock_count', 0)
+    stock_text = f"✅ Auf Lager: `{stock_count}`" if stock_count > 0 else "❌ Ausverkauft"
+    
+    desc = product.get('description') or 'Keine Beschreibung'
+    if short:
+        desc = truncate_text(desc, 200)
+    
+    # Text mit oder ohne Kategorie
+    if is_pro and product.get('category'):
+        return Messages.PRODUCT_DETAILS_WITH_CATEGORY.format(
+            name=product['name'],
+            category=product['category'],
+            desc=desc,
+            price=product['price'],
+            stock=stock_text
+        )
+    
+    return Messages.PRODUCT_DETAILS.format(
+        name=product['name'],
+        desc=desc,
+        price=product['price'],
+        stock=stock_text
+    )
+
+
+def render_catalog_page(storefront: dict, owner_id: int, category_id: int = None, page: int = 0):
     """
-    Zeigt Shop-Katalog (Kundenansicht)
-    Optional gefiltert nach Kategorie
+    Baut eine Katalog-Seite (Text, Buttons, optional Bild)
+    Returns: (text, markup, image_url)
     """
-    user = await get_user_by_id(owner_id)
-    if not user:
-        await message.answer("❌ Shop nicht gefunden.")
-        return
+    is_pro = storefront["profile"].get("is_pro", False)
+    category = storefront.get("category")
+    products = storefront["products"]
+    page_size = Config.CATALOG_PAGE_SIZE
     
-    is_pro = user.get("is_pro", False)
+    page_products, page, total_pages = paginate(products, page, page_size)
     
-    # Produkte holen (optional nach Kategorie gefiltert)
-    products = await get_user_products(owner_id, category=category)
+    # Text
+    parts = []
+    if category:
+        parts.append(Messages.CATALOG_CATEGORY_HEADER.format(category=category))
     
-    if not products:
-        await message.answer(Messages.CATALOG_EMPTY)
-        return
+    if page_products:
+        parts.append(Messages.CATALOG_SEPARATOR.join(
+            format_product_text(p, is_pro, short=page_size > 1) for p in page_products
+        ))
+    else:
+        parts.append(Messages.CATALOG_EMPTY)
     
-    # Bei PRO: Kategorien-Navigation anbieten
-    if is_pro and not category:
-        categories = await get_user_categories(owner_id)
-        if categories:
-            kb = []
-            for cat in categories:
-                # Zähle Produkte in Kategorie
-                cat_products = await get_user_products(owner_id, category=cat['name'])
-                count = len(cat_products)
-                kb.append([types.InlineKeyboardButton(
-                    text=f"📁 {cat['name']} ({count})",
-                    callback_data=f"viewcat_{owner_id}_{cat['name']}"
-                )])
-            
-            kb.append([types.InlineKeyboardButton(
-                text=Buttons.VIEW_ALL,
-                callback_data=f"viewall_{owner_id}"
-            )])
-            
-            await message.answer(
-                "📁 **Kategorien:**\nWähle eine Kategorie oder zeige alle an:",
-                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb),
-                parse_mode="Markdown"
-            )
-    
-    # Produkte anzeigen
-    for product in products:
-        stock_count = await get_stock_count(product['id'])
-        stock_text = f"✅ Auf Lager: `{stock_count}`" if stock_count > 0 else "❌ Ausverkauft"
-        
-        # Text mit oder ohne Kategorie
-        if is_pro and product.get('category'):
-            caption = Messages.PRODUCT_DETAILS_WITH_CATEGORY.format(
-                name=product['name'],
-                category=product['category'],
-                desc=product.get('description', 'Keine Beschreibung'),
-                price=product['price'],
-                stock=stock_text
-            )
-        else:
-            caption = Messages.PRODUCT_DETAILS.format(
-                name=product['name'],
-                desc=product.get('description', 'Keine Beschreibung'),
-                price=product['price'],
-                stock=stock_text
-            )
-        
-        # Buttons
-        builder = InlineKeyboardBuilder()
-        if stock_count > 0:
+    text = "\n\n".join(parts)
+    
+    # Buttons: Kauf-Button pro Produkt der Seite
+    builder = InlineKeyboardBuilder()
+    sold_out = False
+    for product in page_products:
+        if product.get('stock_count', 0) > 0:
             builder.row(types.InlineKeyboardButton(
-                text=Buttons.BUY_NOW.format(price=product['price']),
+                text=Buttons.BUY_ITEM.format(name=product['name'], price=product['price']),
                 callback_data=f"buy_{product['id']}_{owner_id}"
             ))
         else:
+            sold_out = True
+    
+    if sold_out:
+        builder.row(types.InlineKeyboardButton(
+            text=Buttons.CONTACT_SELLER,
+            url=f"tg://user?id={owner_id}"
+        ))
+    
+    # Blättern
+    if total_pages > 1:
+        builder.row(*build_page_nav(
+            lambda p: f"shoppage_{owner_id}_{p}_{category_id or ''}",
+            page,
+            total_pages
+        ))
+    
+    # Bei PRO: Kategorien-Navigation
+    if is_pro:
+        if category_id:
             builder.row(types.InlineKeyboardButton(
-                text=Buttons.CONTACT_SELLER,
-                url=f"tg://user?id={owner_id}"
+                text=Buttons.VIEW_ALL,
+                callback_data=f"viewall_{owner_id}"
             ))
+        else:
+            for cat in storefront["categories"]:
+                builder.row(types.InlineKeyboardButton(
+                    text=f"📁 {cat['name']} ({cat['product_count']})",
+                    callback_data=f"viewcat_{owner_id}_{cat['id']}"
+                ))
+    
+    # Bild nur bei Einzelprodukt-Seiten
+    image = None
+    if is_pro and len(page_products) == 1:
+        image = page_products[0].get('image_url')
+    
+    return text, builder.as_markup(), image
+
+
+async def show_shop_catalog(
+    message: types.Message,
+    owner_id: int,
+    category_id: int = None,
+    page: int = 0,
+    edit: bool = False
+):
+    """
+    Zeigt Shop-Katalog (Kundenansicht) als eine blätterbare Nachricht
+    Optional gefiltert nach Kategorie (ID); edit=True aktualisiert die bestehende Nachricht
+    """
+    # Bereits gerenderte Seite? -> ohne DB-Zugriff ausliefern
+    rendered = get_cached_catalog_page(owner_id, category_id, page)
+    
+    if rendered is None:
+        # Profil, Produkte inkl. Lager & Kategorie-Zähler in einem Aufruf
+        storefront = await get_storefront(owner_id, category_id=category_id)
+        if not storefront:
+            await message.answer("❌ Shop nicht gefunden.")
+            return
         
-        # Mit oder ohne Bild senden
-        if is_pro and product.get('image_url'):
-            try:
-                await message.answer_photo(
-                    photo=product['image_url'],
-                    caption=caption,
-                    reply_markup=builder.as_markup(),
-                    parse_mode="Markdown"
-                )
-            except:
-                # Fallback ohne Bild
-                await message.answer(
-                    caption,
-                    reply_markup=builder.as_markup(),
-                    parse_mode="Markdown"
-                )
+        if not storefront["products"] and not category_id:
+            rendered = (Messages.CATALOG_EMPTY, None, None)
         else:
-            await message.answer(
-                caption,
-                reply_markup=builder.as_markup(),
-                parse_mode="Markdown"
-            )
+            rendered = render_catalog_page(storefront, owner_id, category_id, page)
+        
+        cache_catalog_page(owner_id, category_id, page, rendered)
+    
+    text, markup, image = rendered
+    with send_priority(PRIORITY_LOW):
+        await show_view(message, text, markup, image=image, edit=edit)
+
+
+@router.callback_query(F.data.startswith("shoppage_"))
+async def view_catalog_page(callback: types.CallbackQuery):
+    """Im Katalog blättern"""
+    parts = callback.data.split("_")
+    owner_id = int(parts[1])
+    page = int(parts[2])
+    category_id = int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else None  # Alte Buttons: Name -> alle
+    
+    await show_shop_catalog(callback.message, owner_id, category_id=category_id, page=page, edit=True)
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("viewcat_"))
 async def view_category(callback: types.CallbackQuery):
     """Produkte einer Kategorie anzeigen"""
-    parts = callback.data.split("_", 2)
+    parts = callback.data.split("_")
     owner_id = int(parts[1])
-    category = parts[2]
+    category_id = int(parts[2]) if parts[2].isdigit() else None
     
-    await callback.message.answer(f"📁 **Kategorie: {category}**", parse_mode="Markdown")
-    await show_shop_catalog(callback.message, owner_id, category=category)
+    await show_shop_catalog(callback.message, owner_id, category_id=category_id, edit=True)
     await callback.answer()
 
 
@@ -130,8 +180,13 @@ async def view_all_products(callback: types.CallbackQuery):
     """Alle Produkte anzeigen"""
     owner_id = int(callback.data.split("_")[1])
     
-    await callback.message.answer("📋 **Alle Produkte:**", parse_mode="Markdown")
-    await show_shop_catalog(callback.message, owner_id)
+    await show_shop_catalog(callback.message, owner_id, edit=True)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "noop")
+async def noop_callback(callback: types.CallbackQuery):
+    """Seitenanzeige (ohne Funktion)"""
     await callback.answer()
 
 
@@ -149,9 +204,16 @@ async def start_purchase(callback: types.CallbackQuery):
     product_id = data[1]
     seller_id = int(data[2])
     
-    # Stock prüfen
-    stock_count = await get_stock_count(product_id)
-    if stock_count <= 0:
+    # Produkt (inkl. stock_count) & Verkäufer parallel holen
+    product, seller = await asyncio.gather(
+        get_product_by_id(product_id),
+        get_user_by_id(seller_id)
+    )
+    if not product or not seller or product.get("owner_id") != seller_id:
+        await callback.answer("❌ Produkt nicht mehr verfügbar.", show_alert=True)
+        return
+    
+    if product.get("stock_count", 0) <= 0:
         await callback.answer("⚠️ Leider ausverkauft!", show_alert=True)
         return
     
@@ -166,32 +228,19 @@ async def start_purchase(callback: types.CallbackQuery):
         await callback.answer("❌ Fehler beim Erstellen der Bestellung.", show_alert=True)
         return
     
-    # Verkäufer-Daten holen
-    seller = await get_user_by_id(seller_id)
     is_pro = seller.get("is_pro", False)
+    price = product['price']
     
-    # Zahlungsmethoden zusammenstellen
-    payment_methods = []
-    
-    # BTC & LTC (immer)
-    if seller.get("wallet_btc"):
-        payment_methods.append(f"₿ **BTC:** `{seller['wallet_btc']}`")
-    if seller.get("wallet_ltc"):
-        payment_methods.append(f"Ł **LTC:** `{seller['wallet_ltc']}`")
-    
-    # PRO: ETH, SOL, PayPal
-    if is_pro:
-        if seller.get("wallet_eth"):
-            payment_methods.append(f"Ξ **ETH:** `{seller['wallet_eth']}`")
-        if seller.get("wallet_sol"):
-            payment_methods.append(f"◎ **SOL:** `{seller['wallet_sol']}`")
-        if seller.get("paypal_email"):
-            payment_methods.append(f"🅿️ **PayPal (F&F):** `{seller['paypal_email']}`")
-    
-    # Text für Käufer
-    if payment_methods:
+    # Text für Käufer (Krypto-Beträge aus dem Kurs-Cache)
+    payment_fields = get_payment_fields(seller, is_pro)
+    if payment_fields:
+        amounts = await price_service.quote(
+            price,
+            [WALLET_ASSETS[field] for field in payment_fields if field in WALLET_ASSETS]
+        )
         payment_text = Messages.ORDER_INITIATED.format(
-            payment_methods="\n".join(payment_methods)
+            price=price,
+            payment_methods=format_payment_methods(seller, is_pro, amounts)
         )
     else:
         payment_text = Messages.NO_PAYMENT_METHODS
@@ -199,8 +248,6 @@ async def start_purchase(callback: types.CallbackQuery):
     await callback.message.answer(payment_text, parse_mode="Markdown")
     
     # Verkäufer benachrichtigen
-    product = await get_product_by_id(product_id)
-    
     confirm_kb = [[types.InlineKeyboardButton(
         text=Buttons.CONFIRM_PAYMENT,
         callback_data=f"confirm_{order['id']}"
@@ -213,7 +260,7 @@ async def start_purchase(callback: types.CallbackQuery):
                 username=callback.from_user.username or 'Unbekannt',
                 user_id=callback.from_user.id,
                 product_name=product['name'] if product else 'Unbekannt',
-                price=product['price'] if product else 0,
+                price=price,
                 order_id=order['id']
             ),
             reply_markup=types.InlineKeyboardMarkup(inline_keyboard=confirm_kb),
@@ -1,17 +1,22 @@
 from aiogram import Router, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from config import Config
 from services.db_service import (
     get_all_users_stats, 
-    get_pro_users_list,
-    get_free_users_list,
-    get_user_by_id
+    get_users_page,
+    get_user_by_id,
+    get_profile_cache_stats
 )
 from services.subscription import activate_pro_subscription, cancel_subscription
-from core.strings import Messages
+from services.bot_manager import bot_manager
+from core.strings import Buttons, Messages
+from core.utils import show_view
 
 router = Router()
 
+USER_LIST_PAGE_SIZE = 20
+USER_LIST_SEARCH_MAX = 30  # Bytes (callback_data max. 64 Bytes)
+
 def is_master_admin(user_id: int) -> bool:
     """Prüft ob User Master-Admin ist"""
     return user_id in Config.ADMIN_IDS
@@ -33,6 +38,19 @@ async def master_admin_menu(message: types.Message):
         total_orders=stats["total_orders"]
     )
     
+    cache = get_profile_cache_stats()
+    text += (
+        f"\n\n🗄 **Profil-Cache:** `{cache['size']}/{cache['maxsize']}` Einträge, "
+        f"`{cache['hits']}` Hits / `{cache['misses']}` Misses "
+        f"(Hit-Rate `{cache['hit_rate']:.0%}`)"
+    )
+    
+    states = bot_manager.get_state_counts()
+    text += (
+        f"\n🤖 **Shop-Bots:** `{states['running']}` aktiv, "
+        f"`{states['backoff']}` im Backoff, `{states['dead']}` stillgelegt"
+    )
+    
     await message.answer(text, parse_mode="Markdown")
 
 
@@ -165,50 +183,101 @@ async def master_user_info(message: types.Message):
         await message.answer(f"❌ Fehler: {e}")
 
 
-@router.message(Command("listpro"))
-async def list_pro_users(message: types.Message):
-    """Liste aller PRO-User"""
-    if not is_master_admin(message.from_user.id):
-        return
+def parse_search(args: str):
+    """Suchbegriff aus Befehls-Argumenten (ohne @, gekürzt für callback_data)"""
+    search = (args or "").strip().lstrip("@")
+    return search.encode()[:USER_LIST_SEARCH_MAX].decode(errors="ignore") or None
+
+
+async def show_user_list(
+    message: types.Message,
+    is_pro: bool,
+    after_id: int = None,
+    before_id: int = None,
+    search: str = None,
+    edit: bool = False
+):
+    """User-Liste (PRO/FREE) seitenweise per Keyset, optional nach Username gefiltert"""
+    page = await get_users_page(
+        is_pro,
+        after_id=after_id,
+        before_id=before_id,
+        limit=USER_LIST_PAGE_SIZE,
+        search=search
+    )
+    users = page["users"]
     
-    pro_users = await get_pro_users_list()
+    title = "💎 **PRO-User Liste**" if is_pro else "🆓 **FREE-User Liste**"
+    if search:
+        title += f" (Suche: `{search}`)"
     
-    if not pro_users:
-        await message.answer("Keine PRO-User vorhanden.")
-        return
+    if not users:
+        text = f"{title}\n\nKeine {'PRO' if is_pro else 'FREE'}-User gefunden."
+    else:
+        lines = []
+        for user in users:
+            username = (user.get('username') or 'N/A').replace("_", "\\_")
+            line = f"• @{username} (`{user['id']}`)"
+            if is_pro:
+                expiry = user['expiry_date'][:10] if user.get('expiry_date') else 'Kein Ablauf'
+                line += f" - {expiry}"
+            lines.append(line)
+        text = f"{title}:\n\n" + "\n".join(lines)
     
-    text = "💎 **PRO-User Liste:**\n\n"
-    for user in pro_users[:20]:  # Max 20 anzeigen
-        username = user.get('username', 'N/A')
-        user_id = user.get('id')
-        expiry = user.get('expiry_date', 'N/A')[:10] if user.get('expiry_date') else 'Kein Ablauf'
-        text += f"• @{username} (`{user_id}`) - {expiry}\n"
+    # Blättern per Cursor (erste/letzte ID der Seite)
+    kind = "p" if is_pro else "f"
+    row = []
+    if users and page["has_prev"]:
+        row.append(types.InlineKeyboardButton(
+            text=Buttons.PREV_PAGE,
+            callback_data=f"ulist_{kind}_b_{users[0]['id']}_{search or ''}"
+        ))
+    if users and page["has_next"]:
+        row.append(types.InlineKeyboardButton(
+            text=Buttons.NEXT_PAGE,
+            callback_data=f"ulist_{kind}_n_{users[-1]['id']}_{search or ''}"
+        ))
+    markup = types.InlineKeyboardMarkup(inline_keyboard=[row]) if row else None
     
-    if len(pro_users) > 20:
-        text += f"\n_...und {len(pro_users) - 20} weitere_"
+    await show_view(message, text, markup, edit=edit)
+
+
+@router.message(Command("listpro"))
+async def list_pro_users(message: types.Message, command: CommandObject):
+    """Liste der PRO-User (/listpro [Suche])"""
+    if not is_master_admin(message.from_user.id):
+        return
     
-    await message.answer(text, parse_mode="Markdown")
+    search = parse_search(command.args)
+    await show_user_list(message, is_pro=True, search=search)
 
 
 @router.message(Command("listfree"))
-async def list_free_users(message: types.Message):
-    """Liste aller FREE-User"""
+async def list_free_users(message: types.Message, command: CommandObject):
+    """Liste der FREE-User (/listfree [Suche])"""
     if not is_master_admin(message.from_user.id):
         return
     
-    free_users = await get_free_users_list()
-    
-    if not free_users:
-        await message.answer("Keine FREE-User vorhanden.")
+    search = parse_search(command.args)
+    await show_user_list(message, is_pro=False, search=search)
+
+
+@router.callback_query(F.data.startswith("ulist_"))
+async def page_user_list(callback: types.CallbackQuery):
+    """In der User-Liste blättern"""
+    if not is_master_admin(callback.from_user.id):
+        await callback.answer()
         return
     
-    text = "🆓 **FREE-User Liste:**\n\n"
-    for user in free_users[:20]:  # Max 20 anzeigen
-        username = user.get('username', 'N/A')
-        user_id = user.get('id')
-        text += f"• @{username} (`{user_id}`)\n"
+    _, kind, direction, cursor, search = callback.data.split("_", 4)
+    cursor = int(cursor)
     
-    if len(free_users) > 20:
-        text += f"\n_...und {len(free_users) - 20} weitere_"
-    
-    await message.answer(text, parse_mode="Markdown")
+    await show_user_list(
+        callback.message,
+        is_pro=kind == "p",
+        after_id=cursor if direction == "n" else None,
+        before_id=cursor if direction == "b" else None,
+        search=search or None,
+        edit=True
+    )
+    await callback.answer()
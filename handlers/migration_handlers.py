@@ -5,6 +5,8 @@ from services.migration import (
     get_migration_summary
 )
 from services.db_service import get_user_by_id
+from services.bot_manager import bot_manager
+from core.telegram_session import create_bot
 
 router = Router()
 
@@ -89,12 +91,10 @@ async def confirm_migration(callback: types.CallbackQuery):
         user = await get_user_by_id(callback.from_user.id)
         
         # Bot-Info holen
-        from aiogram import Bot
         try:
-            custom_bot = Bot(token=user["custom_bot_token"])
-            bot_info = await custom_bot.get_me()
-            bot_username = bot_info.username
-            await custom_bot.session.close()
+            bot_username = user.get("bot_username") or (
+                await bot_manager.get_identity(create_bot(user["custom_bot_token"]))
+            )["username"]
         except:
             bot_username = "dein_bot"
         
@@ -148,11 +148,9 @@ async def check_migration_status_handler(callback: types.CallbackQuery):
     if status["migrated"]:
         # Bot-Info holen
         try:
-            from aiogram import Bot
-            custom_bot = Bot(token=user["custom_bot_token"])
-            bot_info = await custom_bot.get_me()
-            bot_username = bot_info.username
-            await custom_bot.session.close()
+            bot_username = user.get("bot_username") or (
+                await bot_manager.get_identity(create_bot(user["custom_bot_token"]))
+            )["username"]
             
             text = (
                 f"✅ **Migration abgeschlossen**\n\n"
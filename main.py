@@ -1,11 +1,7 @@
 import asyncio
 import logging
-import os
-import threading
-from flask import Flask
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.client.default import DefaultBotProperties
+from typing import Set
+from aiogram import Dispatcher
 from config import Config
 
 from bots.master_bot import router as master_router
@@ -21,55 +17,62 @@ from handlers import (
 
 from services.db_service import get_active_pro_users
 from services.bot_manager import bot_manager
-from core.middlewares import ShopMiddleware
+from services.webhook_server import webhook_server
+from services.lease_manager import lease_manager
+from services.price_service import price_service
+from services.export_service import export_service
+from core.middlewares import ShopMiddleware, FSMErrorMiddleware
+from core.telegram_session import create_bot, close_shared_session
+from core.fsm_storage import create_fsm_storage
 from tasks.expiry_check import check_subscription_expiry
 
-app = Flask(__name__)
 _main_dispatcher: Dispatcher = None
 
+# Langlebige Hintergrund-Tasks (starke Referenz, sonst kann der GC sie einsammeln)
+_background_tasks: Set[asyncio.Task] = set()
+
 def get_main_dispatcher() -> Dispatcher:
     return _main_dispatcher
 
-@app.route('/')
-def health():
-    return f"{Config.BRAND_NAME} v{Config.VERSION} is running", 200
-
-def run_flask():
-    port = int(os.environ.get("PORT", 10000))
-    app.run(host="0.0.0.0", port=port)
-
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+def start_background(coro, name: str) -> asyncio.Task:
+    """
+    Hintergrund-Task starten: Referenz halten, Absturz loggen
+    """
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+
+    def on_done(t: asyncio.Task):
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.error(f"❌ Hintergrund-Task {name} abgestürzt: {t.exception()!r}")
+
+    task.add_done_callback(on_done)
+    return task
+
+async def stop_background():
+    """
+    Hintergrund-Tasks abbrechen und auf ihr Ende warten (Shutdown)
+    """
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
 async def start_customer_bots(main_dispatcher: Dispatcher):
+    """
+    Startet alle PRO-Shop-Bots parallel (Einzelprozess-Modus)
+    """
     active_shops = await get_active_pro_users()
-    logger.info(f"Prüfe {len(active_shops)} PRO-User auf eigene Bot-Tokens...")
+    shops = [shop for shop in active_shops if shop.get("custom_bot_token")]
+    logger.info(f"Starte {len(shops)} von {len(active_shops)} PRO-Usern mit eigenem Bot-Token...")
     
-    started_count = 0
-    for shop in active_shops:
-        token = shop.get("custom_bot_token")
-        if token:
-            try:
-                temp_bot = Bot(token=token)
-                await temp_bot.delete_webhook(drop_pending_updates=True)
-                await temp_bot.session.close()
-
-                success = await bot_manager.start_shop_bot(
-                    user_id=shop['id'],
-                    bot_token=token,
-                    dispatcher=main_dispatcher
-                )
-                
-                if success:
-                    started_count += 1
-                    logger.info(f"✅ Shop-Bot für User {shop['id']} gestartet")
-            except Exception as e:
-                logger.error(f"❌ Fehler bei User {shop['id']}: {e}")
-    
-    logger.info(f"📊 {started_count} eigene Shop-Bots aktiv")
+    await bot_manager.start_shop_bots(shops, main_dispatcher)
 
 async def main():
     global _main_dispatcher
@@ -79,12 +82,7 @@ async def main():
         return
 
     logger.info(f"🚀 {Config.BRAND_NAME} wird gestartet...")
-    storage = MemoryStorage()
-
-    master_bot = Bot(
-        token=Config.MASTER_BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode="HTML")
-    )
+    storage = create_fsm_storage()
     
     dp = Dispatcher(storage=storage)
     _main_dispatcher = dp
@@ -92,6 +90,8 @@ async def main():
     # Middleware registrieren (Zwingend vor den Routern)
     dp.message.middleware(ShopMiddleware())
     dp.callback_query.middleware(ShopMiddleware())
+    dp.message.middleware(FSMErrorMiddleware())
+    dp.callback_query.middleware(FSMErrorMiddleware())
 
     # --- ROUTER PRIORISIERUNG ---
     # 1. Höchste Priorität: System/Master-Admin
@@ -112,20 +112,63 @@ async def main():
     # 5. Kunden-Fallbacks (Katalog etc.)
     dp.include_router(customer_router)
 
-    await master_bot.delete_webhook(drop_pending_updates=True)
-    await asyncio.sleep(1)
+    if Config.BOT_MODE == "webhook" and not Config.WEBHOOK_BASE_URL:
+        logger.error("❌ WEBHOOK_BASE_URL fehlt für BOT_MODE=webhook!")
+        return
+
+    if Config.BOT_MODE == "webhook" and not Config.WEBHOOK_SECRET:
+        # Zufälliges Secret pro Prozess würde bei jedem Deploy alle Webhook-URLs ändern
+        logger.error("❌ WEBHOOK_SECRET fehlt für BOT_MODE=webhook!")
+        return
+
+    # HTTP-Server (Health-Check + Webhooks)
+    await webhook_server.start(dp)
+
+    # Master-Bot (im Worker-Modus nur in einem Prozess)
+    master_bot = None
+    if Config.RUN_MASTER_BOT:
+        # Gemeinsamer Connection-Pool, Send-Scheduler ist dort registriert
+        master_bot = create_bot(Config.MASTER_BOT_TOKEN)
 
-    # Start der PRO-Bots
-    await start_customer_bots(dp)
+        if Config.BOT_MODE == "webhook":
+            await webhook_server.register_bot(master_bot)
+        else:
+            await master_bot.delete_webhook(drop_pending_updates=True)
+            await asyncio.sleep(1)
 
-    # Hintergrund-Tasks starten
-    asyncio.create_task(check_subscription_expiry())
+    # Krypto-Kurse vorladen und warm halten (kein Kurs-Abruf im Kaufvorgang)
+    start_background(price_service.keep_warm(), "price_warmup")
 
-    logger.info(f"✅ System bereit. Polling startet...")
-    await dp.start_polling(master_bot, skip_updates=True)
+    # Start der PRO-Bots im Hintergrund (Master-Bot ist sofort erreichbar)
+    if lease_manager.enabled:
+        start_background(lease_manager.run(dp), "lease_manager")
+    else:
+        start_background(start_customer_bots(dp), "start_customer_bots")
+
+    # Hintergrund-Tasks starten (einmal pro System, beim Master-Bot)
+    if Config.RUN_MASTER_BOT:
+        start_background(check_subscription_expiry(), "expiry_check")
+
+    try:
+        if master_bot and Config.BOT_MODE == "polling":
+            logger.info(f"✅ System bereit. Polling startet...")
+            await dp.start_polling(master_bot, skip_updates=True)
+        else:
+            logger.info(f"✅ System bereit ({Config.BOT_MODE}, Worker-Modus: {Config.WORKER_MODE})...")
+            await asyncio.Event().wait()
+    finally:
+        # Zuerst Lease-Loop & Co. beenden, damit keine Bots mehr (neu) gestartet werden
+        await stop_background()
+        # Worker-Modus: Webhooks stehen lassen, der nächste Lease-Inhaber setzt sie neu
+        await bot_manager.stop_all_bots(delete_webhook=not lease_manager.enabled)
+        await lease_manager.release_all()
+        await webhook_server.stop()
+        await export_service.stop()
+        await close_shared_session()
+        await price_service.close()
+        await storage.close()
 
 if __name__ == "__main__":
-    threading.Thread(target=run_flask, daemon=True).start()
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
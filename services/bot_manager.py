@@ -1,15 +1,33 @@
 """
 Bot Manager Service
 Dynamisches Starten und Stoppen von Shop-Bots
+Jeder Shop-Bot pollt in einer eigenen, überwachten Schleife (Supervisor)
 """
 import asyncio
 import logging
-from typing import Dict, Optional
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramNotFound, TelegramUnauthorizedError
+from aiogram.types import Update
+from config import Config
+from core.telegram_session import create_bot
+from services.webhook_server import webhook_server
+from services.lease_manager import lease_manager
+from services.db_service import save_bot_identity
 
 logger = logging.getLogger(__name__)
 
+# Bot-Zustände
+STATE_RUNNING = "running"
+STATE_BACKOFF = "backoff"  # Transienter Fehler, Neustart nach Wartezeit
+STATE_DEAD = "dead"  # Token widerrufen/ungültig, kein Neustart
+
+# Fehler, bei denen ein Neustart sinnlos ist
+FATAL_ERRORS = (TelegramUnauthorizedError, TelegramNotFound)
+
 
 class BotManager:
     """
@@ -19,12 +37,18 @@ class BotManager:
     def __init__(self):
         self.active_bots: Dict[int, Bot] = {}  # user_id -> Bot instance
         self.polling_tasks: Dict[int, asyncio.Task] = {}  # user_id -> Task
+        self.shop_index: Dict[str, int] = {}  # bot_token -> user_id
+        self._starting: Set[int] = set()  # user_ids, deren Start gerade läuft
+        self.bot_states: Dict[int, Dict[str, Any]] = {}  # user_id -> Zustand (auch für tote Bots)
+        self._update_tasks: Set[asyncio.Task] = set()
+        self.identities: Dict[int, Dict[str, Any]] = {}  # bot_id -> {"id", "username", "first_name"}
     
     async def start_shop_bot(
         self, 
         user_id: int, 
         bot_token: str, 
-        dispatcher: Dispatcher
+        dispatcher: Dispatcher,
+        profile: Optional[Dict] = None
     ) -> bool:
         """
         Startet einen Shop-Bot
@@ -33,55 +57,258 @@ class BotManager:
             user_id: Telegram User ID des Besitzers
             bot_token: Bot API Token
             dispatcher: Hauptdispatcher (Router werden geteilt)
+            profile: Profil mit gespeicherter Bot-Identität (spart getMe)
         
         Returns:
             True wenn erfolgreich gestartet
         """
+        # Läuft bereits mit altem Token (z.B. Token im Shop geändert): neu starten
+        running = self.active_bots.get(user_id)
+        if running is not None and running.token != bot_token:
+            logger.info(f"🔄 Neuer Bot-Token für User {user_id} - starte Bot neu")
+            return await self.restart_shop_bot(user_id, bot_token, dispatcher, profile=profile)
+        
         # Prüfe ob Bot bereits läuft
-        if user_id in self.active_bots:
+        if user_id in self.active_bots or user_id in self._starting:
             logger.warning(f"Bot für User {user_id} läuft bereits")
             return True
         
+        # Worker-Modus: nur Bots mit eigener Lease starten
+        if not await lease_manager.claim(user_id):
+            logger.info(f"Keine Lease für User {user_id} (anderer Worker oder Shop nicht aktiv)")
+            return False
+        
+        self._starting.add(user_id)
         try:
-            # Bot-Instanz erstellen
-            bot = Bot(
-                token=bot_token,
-                default=DefaultBotProperties(parse_mode="HTML")
-            )
+            # Bot-Instanz erstellen (gemeinsamer Connection-Pool)
+            bot = create_bot(bot_token)
             
-            # Webhook löschen
-            await bot.delete_webhook(drop_pending_updates=True)
-            await asyncio.sleep(0.5)
+            if Config.BOT_MODE == "webhook":
+                # Webhook setzen (Updates kommen über den gemeinsamen HTTP-Server)
+                await webhook_server.register_bot(bot)
+            else:
+                # Webhook löschen (einmal pro Bot, alte Updates verwerfen)
+                await bot.delete_webhook(drop_pending_updates=True)
             
-            # Polling starten (als Background-Task)
-            task = asyncio.create_task(
-                dispatcher.start_polling(bot, skip_updates=True)
-            )
+            # Bot-Identität: aus Profil/Cache, sonst getMe und im Profil speichern
+            identity = self._identity_from_profile(bot, profile)
+            if identity is None:
+                identity = await self.get_identity(bot)
+                await save_bot_identity(user_id, identity)
             
             # In Registry speichern
             self.active_bots[user_id] = bot
-            self.polling_tasks[user_id] = task
+            self.register_shop_token(bot_token, user_id)
+            self._set_state(user_id, STATE_RUNNING)
             
-            bot_info = await bot.get_me()
-            logger.info(f"✅ Shop-Bot gestartet: @{bot_info.username} (User: {user_id})")
+            if Config.BOT_MODE != "webhook":
+                # Überwachtes Polling (als Background-Task)
+                task = asyncio.create_task(self._supervise(user_id, bot, dispatcher))
+                task.add_done_callback(lambda t: self._on_supervisor_done(user_id, t))
+                self.polling_tasks[user_id] = task
+            
+            logger.info(f"✅ Shop-Bot gestartet: @{identity['username']} (User: {user_id})")
             
             return True
             
+        except FATAL_ERRORS as e:
+            # z.B. set_webhook/delete_webhook mit widerrufenem Token
+            self._park_bot(user_id, str(e), token=bot_token)
+            logger.error(f"💀 Bot-Token von User {user_id} ungültig: {e}")
+            return False
         except Exception as e:
             logger.error(f"❌ Fehler beim Starten von Bot für User {user_id}: {e}")
             return False
+        finally:
+            self._starting.discard(user_id)
+    
+    async def start_shop_bots(self, shops: List[Dict], dispatcher: Dispatcher) -> int:
+        """
+        Startet mehrere Shop-Bots parallel (begrenzt durch BOT_STARTUP_CONCURRENCY)
+        
+        Args:
+            shops: Profile mit id und custom_bot_token
+            dispatcher: Hauptdispatcher
+        
+        Returns:
+            Anzahl erfolgreich gestarteter Bots
+        """
+        semaphore = asyncio.Semaphore(Config.BOT_STARTUP_CONCURRENCY)
+        
+        async def start_one(shop: Dict) -> bool:
+            async with semaphore:
+                started_at = time.monotonic()
+                success = await self.start_shop_bot(
+                    user_id=shop['id'],
+                    bot_token=shop['custom_bot_token'],
+                    dispatcher=dispatcher,
+                    profile=shop
+                )
+                logger.info(
+                    f"{'✅' if success else '❌'} Shop-Bot für User {shop['id']} "
+                    f"in {time.monotonic() - started_at:.2f}s"
+                )
+                return success
+        
+        started_at = time.monotonic()
+        results = await asyncio.gather(*(start_one(shop) for shop in shops))
+        
+        started = sum(results)
+        logger.info(
+            f"📊 {started} Shop-Bots gestartet "
+            f"({len(results) - started} fehlgeschlagen, {time.monotonic() - started_at:.1f}s)"
+        )
+        return started
+    
+    def remember_identity(self, bot_id: int, username: str, first_name: str) -> Dict[str, Any]:
+        """
+        Bot-Identität im Cache ablegen
+        """
+        identity = {"id": bot_id, "username": username, "first_name": first_name}
+        self.identities[bot_id] = identity
+        return identity
+    
+    async def get_identity(self, bot: Bot) -> Dict[str, Any]:
+        """
+        Identität eines Bots (id, username, first_name) - getMe nur beim ersten Mal
+        """
+        identity = self.identities.get(bot.id)
+        if identity is None:
+            bot_info = await bot.get_me()
+            identity = self.remember_identity(bot_info.id, bot_info.username, bot_info.first_name)
+        return identity
+    
+    def _identity_from_profile(self, bot: Bot, profile: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """
+        Gespeicherte Identität aus dem Profil übernehmen (nur wenn sie zum Token passt)
+        """
+        if not profile or not profile.get("bot_username") or profile.get("bot_id") != bot.id:
+            return None
+        return self.remember_identity(bot.id, profile["bot_username"], profile.get("bot_name"))
+    
+    def _set_state(
+        self,
+        user_id: int,
+        state: str,
+        error: Optional[str] = None,
+        failures: int = 0,
+        token: Optional[str] = None
+    ):
+        """
+        Zustand eines Bots setzen (token: bei STATE_DEAD der ungültige Token)
+        """
+        self.bot_states[user_id] = {
+            "state": state,
+            "failures": failures,
+            "error": error,
+            "token": token,
+            "since": datetime.now(timezone.utc)
+        }
+    
+    async def _supervise(self, user_id: int, bot: Bot, dispatcher: Dispatcher):
+        """
+        Supervisor eines Shop-Bots: Polling starten, Fehler klassifizieren,
+        bei transienten Fehlern mit exponentiellem Backoff + Jitter neu starten,
+        bei widerrufenem Token den Bot stilllegen
+        """
+        allowed_updates = dispatcher.resolve_used_update_types()
+        offset: Optional[int] = None
+        failures = 0
+        
+        while True:
+            try:
+                # Long-Polling
+                updates = await bot.get_updates(
+                    offset=offset,
+                    timeout=Config.POLLING_TIMEOUT,
+                    allowed_updates=allowed_updates,
+                    request_timeout=Config.POLLING_TIMEOUT + 10
+                )
+            
+            except asyncio.CancelledError:
+                raise
+            
+            except FATAL_ERRORS as e:
+                logger.error(f"💀 Shop-Bot von User {user_id} stillgelegt (Token ungültig): {e}")
+                self._park_bot(user_id, str(e))
+                return
+            
+            except Exception as e:
+                failures += 1
+                delay = min(
+                    Config.BOT_RESTART_BACKOFF_MAX,
+                    Config.BOT_RESTART_BACKOFF_BASE * 2 ** (failures - 1)
+                )
+                delay = delay / 2 + random.uniform(0, delay / 2)  # Jitter
+                
+                self._set_state(user_id, STATE_BACKOFF, error=str(e), failures=failures)
+                logger.warning(
+                    f"⚠️ Polling-Fehler bei User {user_id} ({type(e).__name__}: {e}) - "
+                    f"Neustart in {delay:.1f}s (Fehler #{failures})"
+                )
+                await asyncio.sleep(delay)
+                continue
+            
+            if failures:
+                failures = 0
+                self._set_state(user_id, STATE_RUNNING)
+                logger.info(f"✅ Shop-Bot von User {user_id} läuft wieder")
+            
+            for update in updates:
+                offset = update.update_id + 1
+                self.feed_update(dispatcher, bot, update)
+    
+    def _on_supervisor_done(self, user_id: int, task: asyncio.Task):
+        """
+        Unerwartetes Ende eines Supervisors melden (z.B. Programmfehler)
+        """
+        if task.cancelled() or task.exception() is None:
+            return
+        
+        logger.error(f"❌ Supervisor für User {user_id} abgestürzt: {task.exception()}")
+        self._park_bot(user_id, str(task.exception()))
+    
+    def feed_update(self, dispatcher: Dispatcher, bot: Bot, update: Update):
+        """
+        Update im Hintergrund verarbeiten (Polling & Webhook)
+        Handler-Fehler werden geloggt und stoppen den Empfang nicht
+        """
+        async def process():
+            try:
+                await dispatcher.feed_update(bot, update)
+            except Exception as e:
+                logger.exception(f"Fehler bei Update {update.update_id} (Bot {bot.id}): {e}")
+        
+        task = asyncio.create_task(process())
+        self._update_tasks.add(task)
+        task.add_done_callback(self._update_tasks.discard)
+    
+    def _park_bot(self, user_id: int, error: str, token: Optional[str] = None):
+        """
+        Bot mit widerrufenem Token aus dem Betrieb nehmen (Zustand bleibt sichtbar)
+        """
+        bot = self.active_bots.pop(user_id, None)
+        self.polling_tasks.pop(user_id, None)
+        if bot:
+            self.shop_index.pop(bot.token, None)
+            token = token or bot.token
+        
+        self._set_state(user_id, STATE_DEAD, error=error, token=token)
     
-    async def stop_shop_bot(self, user_id: int) -> bool:
+    async def stop_shop_bot(self, user_id: int, delete_webhook: bool = True) -> bool:
         """
         Stoppt einen Shop-Bot
         
         Args:
             user_id: Telegram User ID des Besitzers
+            delete_webhook: False bei Lease-Verlust (neuer Inhaber hat den Webhook evtl. schon gesetzt)
         
         Returns:
             True wenn erfolgreich gestoppt
         """
         if user_id not in self.active_bots:
+            # Stillgelegte Bots nur austragen
+            self.bot_states.pop(user_id, None)
             logger.warning(f"Kein aktiver Bot für User {user_id} gefunden")
             return False
         
@@ -89,12 +316,11 @@ class BotManager:
             bot = self.active_bots[user_id]
             task = self.polling_tasks.get(user_id)
             
-            # Bot-Info vor dem Schließen holen
-            try:
-                bot_info = await bot.get_me()
-                bot_username = bot_info.username
-            except:
-                bot_username = "Unknown"
+            bot_username = self.identities.get(bot.id, {}).get("username", "Unknown")
+            
+            # Webhook entfernen
+            if Config.BOT_MODE == "webhook":
+                await webhook_server.unregister_bot(bot, delete_webhook=delete_webhook)
             
             # Polling-Task stoppen
             if task and not task.done():
@@ -104,13 +330,12 @@ class BotManager:
                 except asyncio.CancelledError:
                     pass
             
-            # Bot-Session schließen
-            await bot.session.close()
-            
             # Aus Registry entfernen
             del self.active_bots[user_id]
+            self.shop_index.pop(bot.token, None)
             if user_id in self.polling_tasks:
                 del self.polling_tasks[user_id]
+            self.bot_states.pop(user_id, None)
             
             logger.info(f"🛑 Shop-Bot gestoppt: @{bot_username} (User: {user_id})")
             return True
@@ -123,21 +348,67 @@ class BotManager:
         self,
         user_id: int,
         bot_token: str,
-        dispatcher: Dispatcher
+        dispatcher: Dispatcher,
+        profile: Optional[Dict] = None
     ) -> bool:
         """
         Startet einen Bot neu
         """
         await self.stop_shop_bot(user_id)
         await asyncio.sleep(1)
-        return await self.start_shop_bot(user_id, bot_token, dispatcher)
+        return await self.start_shop_bot(user_id, bot_token, dispatcher, profile=profile)
+    
+    def register_shop_token(self, bot_token: str, user_id: int):
+        """
+        Bot-Token im Shop-Index hinterlegen
+        """
+        self.shop_index[bot_token] = user_id
+    
+    def get_shop_owner_by_token(self, bot_token: str) -> Optional[int]:
+        """
+        Shop-Besitzer anhand des Bot-Tokens (ohne DB-Zugriff)
+        """
+        return self.shop_index.get(bot_token)
+    
+    def get_bot_token(self, user_id: int) -> Optional[str]:
+        """
+        Token des laufenden Bots (None wenn keiner läuft)
+        """
+        bot = self.active_bots.get(user_id)
+        return bot.token if bot else None
     
     def is_bot_running(self, user_id: int) -> bool:
         """
-        Prüft ob Bot läuft
+        Prüft ob Bot läuft (auch während eines Backoffs nach transientem Fehler)
         """
         return user_id in self.active_bots
     
+    def is_bot_dead(self, user_id: int, token: Optional[str] = None) -> bool:
+        """
+        Prüft ob Bot wegen ungültigem Token stillgelegt wurde
+        Mit token: nur wenn es derselbe Token ist (neuer Token = neuer Startversuch)
+        """
+        entry = self.bot_states.get(user_id)
+        if not entry or entry["state"] != STATE_DEAD:
+            return False
+        return token is None or entry.get("token") in (None, token)
+    
+    def get_bot_state(self, user_id: int) -> Optional[str]:
+        """
+        Zustand eines Bots: running, backoff, dead oder None (nicht gestartet)
+        """
+        entry = self.bot_states.get(user_id)
+        return entry["state"] if entry else None
+    
+    def get_state_counts(self) -> Dict[str, int]:
+        """
+        Anzahl Bots pro Zustand (für Monitoring)
+        """
+        counts = {STATE_RUNNING: 0, STATE_BACKOFF: 0, STATE_DEAD: 0}
+        for entry in self.bot_states.values():
+            counts[entry["state"]] += 1
+        return counts
+    
     def get_active_bot_count(self) -> int:
         """
         Anzahl aktiver Bots
@@ -150,7 +421,7 @@ class BotManager:
         """
         return list(self.active_bots.keys())
     
-    async def stop_all_bots(self):
+    async def stop_all_bots(self, delete_webhook: bool = True):
         """
         Stoppt alle Bots (z.B. beim Shutdown)
         """
@@ -158,7 +429,7 @@ class BotManager:
         
         user_ids = list(self.active_bots.keys())
         for user_id in user_ids:
-            await self.stop_shop_bot(user_id)
+            await self.stop_shop_bot(user_id, delete_webhook=delete_webhook)
         
         logger.info("✅ Alle Shop-Bots gestoppt")
     
@@ -166,21 +437,28 @@ class BotManager:
         """
         Status eines Bots abrufen
         """
+        entry = self.bot_states.get(user_id, {})
+        
         if user_id not in self.active_bots:
             return {
                 "running": False,
+                "state": entry.get("state"),
+                "error": entry.get("error"),
                 "bot_username": None
             }
         
         try:
             bot = self.active_bots[user_id]
-            bot_info = await bot.get_me()
+            identity = await self.get_identity(bot)
             
             return {
                 "running": True,
-                "bot_username": bot_info.username,
-                "bot_id": bot_info.id,
-                "bot_name": bot_info.first_name
+                "state": entry.get("state"),
+                "failures": entry.get("failures", 0),
+                "error": entry.get("error"),
+                "bot_username": identity["username"],
+                "bot_id": identity["id"],
+                "bot_name": identity["first_name"]
             }
         except Exception as e:
             logger.error(f"Fehler beim Abrufen des Bot-Status: {e}")
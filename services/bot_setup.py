@@ -7,6 +7,8 @@ from typing import Optional, Dict, Any
 from aiogram import Bot
 from aiogram.types import BotCommand, BotCommandScopeDefault
 from config import Config
+from core.telegram_session import create_bot
+from services.bot_manager import bot_manager
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +28,14 @@ async def setup_shop_bot(bot_token: str, owner_id: int, shop_id: str) -> Dict[st
     }
     """
     try:
-        # Bot-Instanz erstellen
-        bot = Bot(token=bot_token)
+        # Bot-Instanz erstellen (gemeinsamer Connection-Pool)
+        bot = create_bot(bot_token)
         
         # 1. Bot-Info holen
         bot_info = await bot.get_me()
         bot_username = bot_info.username
         bot_name = bot_info.first_name
+        bot_manager.remember_identity(bot_info.id, bot_username, bot_name)
         
         logger.info(f"Setup für Bot @{bot_username} (ID: {bot_info.id})")
         
@@ -67,9 +70,6 @@ async def setup_shop_bot(bot_token: str, owner_id: int, shop_id: str) -> Dict[st
         except Exception as e:
             logger.warning(f"Kurzbeschreibung setzen fehlgeschlagen: {e}")
         
-        # Bot-Session schließen
-        await bot.session.close()
-        
         return {
             "success": True,
             "bot_username": bot_username,
@@ -97,9 +97,8 @@ async def validate_bot_token(bot_token: str) -> Dict[str, Any]:
     }
     """
     try:
-        bot = Bot(token=bot_token)
+        bot = create_bot(bot_token)
         bot_info = await bot.get_me()
-        await bot.session.close()
         
         return {
             "valid": True,
@@ -1,7 +1,24 @@
 import random
 import string
-from typing import List, Optional, Dict, Any
-from core.supabase_client import db
+from typing import List, Optional, Dict, Any, Tuple
+from core.supabase_client import db, run_query
+from core.cache import TTLCache
+from config import Config
+
+# Max. Zeilen pro Insert in stock_items
+STOCK_BATCH_SIZE = 500
+
+# Max. Shop-IDs pro Token-Abfrage
+TOKEN_LOOKUP_CHUNK = 200
+
+# Profil-Cache: telegram_id -> profile dict
+profile_cache = TTLCache(maxsize=Config.PROFILE_CACHE_SIZE, ttl=Config.PROFILE_CACHE_TTL)
+
+# Katalog-Cache: owner_id -> {(category, page): gerenderte Seite}
+catalog_cache = TTLCache(maxsize=Config.CATALOG_CACHE_SIZE, ttl=Config.CATALOG_CACHE_TTL)
+
+# System-Statistiken (/master), kurz gecacht
+stats_cache = TTLCache(maxsize=1, ttl=Config.SYSTEM_STATS_CACHE_TTL)
 
 # ========================================
 # HELPER FUNCTIONS
@@ -13,39 +30,76 @@ def generate_unique_shop_id(length=6) -> str:
     return ''.join(random.choice(characters) for _ in range(length))
 
 
+def invalidate_user_cache(telegram_id: int):
+    """Entfernt ein Profil aus dem Cache (nach jeder Änderung aufrufen)"""
+    profile_cache.invalidate(int(telegram_id))
+    # Katalog hängt vom Profil ab (z.B. PRO-Status)
+    invalidate_catalog_cache(telegram_id)
+
+
+def invalidate_catalog_cache(owner_id: int):
+    """Verwirft alle gerenderten Katalog-Seiten eines Shops"""
+    catalog_cache.invalidate(int(owner_id))
+
+
+def get_cached_catalog_page(owner_id: int, category_id: Optional[int], page: int) -> Optional[Any]:
+    """Gerenderte Katalog-Seite aus dem Cache (None bei Miss)"""
+    pages = catalog_cache.get(int(owner_id))
+    return pages.get((category_id, page)) if pages else None
+
+
+def cache_catalog_page(owner_id: int, category_id: Optional[int], page: int, rendered: Any):
+    """Gerenderte Katalog-Seite speichern"""
+    pages = catalog_cache.peek(int(owner_id))
+    if pages is None:
+        pages = {}
+        catalog_cache.set(int(owner_id), pages)
+    pages[(category_id, page)] = rendered
+
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    """Hit/Miss-Statistik des Profil-Caches"""
+    return profile_cache.stats()
+
+
 # ========================================
 # USER / PROFILE MANAGEMENT
 # ========================================
 
 async def get_active_pro_users() -> List[Dict]:
     """Holt alle aktiven PRO-User für Bot-Starts"""
-    response = db.table("profiles").select("*").eq("is_pro", True).execute()
+    response = await run_query(db.table("profiles").select("*").eq("is_pro", True))
     return response.data
 
 
 async def get_user_by_id(telegram_id: int) -> Optional[Dict]:
-    """Holt User-Profil anhand Telegram ID"""
-    response = db.table("profiles").select("*").eq("id", telegram_id).execute()
+    """Holt User-Profil anhand Telegram ID (aus dem Cache, falls vorhanden)"""
+    cached = profile_cache.get(int(telegram_id))
+    if cached is not None:
+        return dict(cached)
+    
+    response = await run_query(db.table("profiles").select("*").eq("id", telegram_id))
     if response.data:
         user = response.data[0]
         # Auto-Generiere Shop-ID falls nicht vorhanden
         if not user.get("shop_id"):
             new_id = generate_unique_shop_id()
-            db.table("profiles").update({"shop_id": new_id}).eq("id", telegram_id).execute()
+            await run_query(db.table("profiles").update({"shop_id": new_id}).eq("id", telegram_id))
             user["shop_id"] = new_id
-        return user
+        profile_cache.set(int(telegram_id), user)
+        return dict(user)
     return None
 
 
 async def get_user_by_shop_id(shop_id: str) -> Optional[Dict]:
     """Holt User anhand Shop-ID"""
-    response = db.table("profiles").select("*").eq("shop_id", shop_id.upper()).execute()
+    response = await run_query(db.table("profiles").select("*").eq("shop_id", shop_id.upper()))
     return response.data[0] if response.data else None
 
 
 async def get_shop_by_token(token: str) -> Optional[Dict]:
     """Holt Shop anhand Bot-Token"""
-    response = db.table("profiles").select("*").eq("custom_bot_token", token).execute()
+    response = await run_query(db.table("profiles").select("*").eq("custom_bot_token", token))
     return response.data[0] if response.data else None
 
 
@@ -60,19 +114,41 @@ async def create_new_user(telegram_id: int, username: str) -> bool:
             "is_pro": False,
             "shop_id": shop_id
         }
-        db.table("profiles").insert(data).execute()
+        await run_query(db.table("profiles").insert(data))
+        invalidate_user_cache(telegram_id)
         return True
     return False
 
 
 async def update_user_token(telegram_id: int, token: str):
     """Speichert Bot-Token für PRO-User"""
-    db.table("profiles").update({"custom_bot_token": token}).eq("id", telegram_id).execute()
+    await run_query(db.table("profiles").update({
+        "custom_bot_token": token,
+        # Identität gehört zum alten Token
+        "bot_id": None,
+        "bot_username": None,
+        "bot_name": None
+    }).eq("id", telegram_id))
+    invalidate_user_cache(telegram_id)
+
+
+async def save_bot_identity(telegram_id: int, identity: Dict):
+    """Speichert Bot-Identität (id, username, first_name) im Profil"""
+    try:
+        await run_query(db.table("profiles").update({
+            "bot_id": identity["id"],
+            "bot_username": identity["username"],
+            "bot_name": identity["first_name"]
+        }).eq("id", telegram_id))
+        invalidate_user_cache(telegram_id)
+    except Exception as e:
+        print(f"Error saving bot identity: {e}")
 
 
 async def update_payment_methods(telegram_id: int, payment_data: dict):
     """Aktualisiert Zahlungsmethoden"""
-    db.table("profiles").update(payment_data).eq("id", telegram_id).execute()
+    await run_query(db.table("profiles").update(payment_data).eq("id", telegram_id))
+    invalidate_user_cache(telegram_id)
 
 
 # ========================================
@@ -90,13 +166,37 @@ async def get_user_products(owner_id: int, category: Optional[str] = None) -> Li
         if category:
             query = query.eq("category", category)
         
-        response = query.order("created_at", desc=True).execute()
+        response = await run_query(query.order("created_at", desc=True))
         return response.data
     except Exception as e:
         print(f"Error getting products: {e}")
         return []
 
 
+async def get_storefront(owner_id: int, category_id: Optional[int] = None) -> Optional[Dict]:
+    """
+    Holt alles für die Shop-Ansicht in einem Aufruf
+    Returns: {
+        "profile": {...},
+        "category": Name der gewählten Kategorie oder None,
+        "products": [... inkl. stock_count],
+        "categories": [{"id": int, "name": str, "product_count": int}]
+    } oder None, falls der Shop nicht existiert
+    """
+    try:
+        response = await run_query(db.rpc("get_storefront", {
+            "p_owner_id": int(owner_id),
+            "p_category_id": category_id
+        }))
+        storefront = response.data
+        if not storefront or not storefront.get("profile"):
+            return None
+        return storefront
+    except Exception as e:
+        print(f"Error getting storefront: {e}")
+        return None
+
+
 async def add_product(
     owner_id: int, 
     name: str, 
@@ -106,25 +206,25 @@ async def add_product(
     category: Optional[str] = None,
     image_url: Optional[str] = None
 ) -> Optional[Dict]:
-    """Erstellt neues Produkt"""
-    # Content formatieren (eine Zeile pro Item)
-    clean_content = ""
-    if content:
-        items = [i.strip() for i in content.replace(",", "\n").split("\n") if i.strip()]
-        clean_content = "\n".join(items)
-    
+    """Erstellt neues Produkt (Lagerbestand landet in stock_items)"""
     data = {
         "owner_id": int(owner_id),
         "name": name,
         "price": price,
-        "content": clean_content,
         "description": description,
         "category": category,
         "image_url": image_url
     }
     
-    response = db.table("products").insert(data).execute()
-    return response.data[0] if response.data else None
+    response = await run_query(db.table("products").insert(data))
+    product = response.data[0] if response.data else None
+    
+    if product and content:
+        items = parse_stock_items(content)
+        product["skipped_items"] = len(items) - await insert_stock_items(product["id"], items)
+    
+    invalidate_catalog_cache(owner_id)
+    return product
 
 
 async def update_product(
@@ -143,41 +243,86 @@ async def update_product(
         if not update_data:
             return False
         
-        db.table("products").update(update_data).eq("id", query_id).eq("owner_id", int(owner_id)).execute()
+        await run_query(db.table("products").update(update_data).eq("id", query_id).eq("owner_id", int(owner_id)))
+        invalidate_catalog_cache(owner_id)
         return True
     except Exception as e:
         print(f"Error updating product: {e}")
         return False
 
 
-async def refill_stock(product_id, owner_id: int, new_content: str) -> int:
-    """Fügt Lagerbestand hinzu"""
+def parse_stock_items(content: str) -> List[str]:
+    """Zerlegt eingegebenen Lagerbestand in einzelne Items (eine Zeile/Komma pro Item)"""
+    if not content:
+        return []
+    return [i.strip() for i in content.replace(",", "\n").split("\n") if i.strip()]
+
+
+async def insert_stock_items(product_id, items: List[str]) -> int:
+    """
+    Legt Items in stock_items an (in Batches)
+    Duplikate (gleicher Inhalt im selben Produkt) verwirft der Unique-Index auf content_hash
+    Returns: Anzahl tatsächlich angelegter Items
+    """
+    query_id = int(product_id) if str(product_id).isdigit() else product_id
+    added = 0
+    
+    for start in range(0, len(items), STOCK_BATCH_SIZE):
+        batch = items[start:start + STOCK_BATCH_SIZE]
+        rows = [{"product_id": query_id, "content": item} for item in batch]
+        response = await run_query(
+            db.table("stock_items").upsert(
+                rows,
+                on_conflict="product_id,content_hash",
+                ignore_duplicates=True
+            )
+        )
+        added += len(response.data or [])
+    
+    return added
+
+
+async def refill_stock(product_id, owner_id: int, new_content: str) -> Optional[Tuple[int, int]]:
+    """
+    Fügt Lagerbestand hinzu
+    Returns: (hinzugefügt, übersprungen) - übersprungen = bereits vorhandene Items
+             None wenn das Produkt nicht (mehr) existiert
+    """
     try:
         query_id = int(product_id) if str(product_id).isdigit() else product_id
-        product = db.table("products").select("content").eq("id", query_id).eq("owner_id", int(owner_id)).single().execute()
+        product = await run_query(db.table("products").select("id").eq("id", query_id).eq("owner_id", int(owner_id)))
         
         if product.data:
-            old_content = product.data.get("content", "")
-            items = [i.strip() for i in new_content.replace(",", "\n").split("\n") if i.strip()]
-            updated_content = (old_content + ("\n" if old_content else "") + "\n".join(items)).strip()
-            
-            db.table("products").update({"content": updated_content}).eq("id", query_id).execute()
-            return len(items)
+            items = parse_stock_items(new_content)
+            added = await insert_stock_items(query_id, items)
+            invalidate_catalog_cache(owner_id)
+            return added, len(items) - added
+        return None
     except Exception as e:
         print(f"Error refilling stock: {e}")
-    return 0
+    return 0, 0
+
+
+async def get_stock_items_page(product_id, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+    """Verfügbare Items eines Produkts seitenweise (Keyset über id)"""
+    response = await run_query(
+        db.table("stock_items")
+        .select("id, content, created_at")
+        .eq("product_id", int(product_id))
+        .eq("status", "available")
+        .gt("id", after_id)
+        .order("id")
+        .limit(limit)
+    )
+    return response.data or []
 
 
 async def get_stock_count(product_id) -> int:
-    """Zählt verfügbare Items im Lager"""
+    """Anzahl verfügbarer Items (gepflegter Zähler in products.stock_count)"""
     try:
         query_id = int(product_id) if str(product_id).isdigit() else product_id
-        product = db.table("products").select("content").eq("id", query_id).single().execute()
-        
-        if not product.data or not product.data.get("content"):
-            return 0
-        
-        return len([i for i in product.data["content"].split("\n") if i.strip()])
+        response = await run_query(db.table("products").select("stock_count").eq("id", query_id))
+        return response.data[0]["stock_count"] if response.data else 0
     except:
         return 0
 
@@ -187,9 +332,10 @@ async def delete_product(product_id, owner_id: int) -> bool:
     query_id = int(product_id) if str(product_id).isdigit() else product_id
     try:
         # Erst Bestellungen löschen
-        db.table("orders").delete().eq("product_id", query_id).execute()
+        await run_query(db.table("orders").delete().eq("product_id", query_id))
         # Dann Produkt
-        db.table("products").delete().eq("id", query_id).eq("owner_id", int(owner_id)).execute()
+        await run_query(db.table("products").delete().eq("id", query_id).eq("owner_id", int(owner_id)))
+        invalidate_catalog_cache(owner_id)
         return True
     except Exception as e:
         print(f"Error deleting product: {e}")
@@ -203,7 +349,7 @@ async def delete_product(product_id, owner_id: int) -> bool:
 async def get_user_categories(owner_id: int) -> List[Dict]:
     """Holt alle Kategorien eines Users"""
     try:
-        response = db.table("categories").select("*").eq("owner_id", int(owner_id)).execute()
+        response = await run_query(db.table("categories").select("*").eq("owner_id", int(owner_id)))
         return response.data
     except:
         return []
@@ -217,7 +363,8 @@ async def create_category(owner_id: int, name: str, description: str = "") -> Op
             "name": name,
             "description": description
         }
-        response = db.table("categories").insert(data).execute()
+        response = await run_query(db.table("categories").insert(data))
+        invalidate_catalog_cache(owner_id)
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error creating category: {e}")
@@ -227,9 +374,16 @@ async def create_category(owner_id: int, name: str, description: str = "") -> Op
 async def delete_category(category_id: int, owner_id: int) -> bool:
     """Löscht Kategorie"""
     try:
-        db.table("categories").delete().eq("id", category_id).eq("owner_id", int(owner_id)).execute()
-        # Produkte in dieser Kategorie auf NULL setzen
-        db.table("products").update({"category": None}).eq("category_id", category_id).execute()
+        response = await run_query(db.table("categories").delete().eq("id", category_id).eq("owner_id", int(owner_id)))
+        # Produkte in dieser Kategorie auf NULL setzen (Zuordnung über den Namen)
+        if response.data:
+            await run_query(
+                db.table("products")
+                .update({"category": None})
+                .eq("owner_id", int(owner_id))
+                .eq("category", response.data[0]["name"])
+            )
+        invalidate_catalog_cache(owner_id)
         return True
     except Exception as e:
         print(f"Error deleting category: {e}")
@@ -240,12 +394,61 @@ async def get_product_by_id(product_id) -> Optional[Dict]:
     """Holt einzelnes Produkt"""
     try:
         query_id = int(product_id) if str(product_id).isdigit() else product_id
-        response = db.table("products").select("*").eq("id", query_id).single().execute()
+        response = await run_query(db.table("products").select("*").eq("id", query_id).single())
         return response.data if response.data else None
     except:
         return None
 
 
+# ========================================
+# BOT LEASES (Worker-Modus)
+# ========================================
+
+async def get_bot_tokens(owner_ids: List[int]) -> List[Dict]:
+    """Holt Bot-Tokens für bestimmte Shops (id, Token & gespeicherte Bot-Identität)"""
+    owner_ids = list(owner_ids)
+    shops = []
+    # In Blöcken abfragen (IN-Liste steht in der URL)
+    for start in range(0, len(owner_ids), TOKEN_LOOKUP_CHUNK):
+        response = await run_query(
+            db.table("profiles")
+            .select("id, custom_bot_token, bot_id, bot_username, bot_name")
+            .in_("id", owner_ids[start:start + TOKEN_LOOKUP_CHUNK])
+            .not_.is_("custom_bot_token", "null")
+        )
+        shops.extend(response.data)
+    return shops
+
+
+async def sync_bot_leases(worker_id: str, lease_seconds: int) -> List[int]:
+    """Heartbeat + Lease-Verlängerung; liefert alle Shop-IDs mit eigener Lease"""
+    response = await run_query(db.rpc("sync_bot_leases", {
+        "p_worker_id": worker_id,
+        "p_lease_seconds": lease_seconds
+    }))
+    return [int(owner_id) for owner_id in response.data or []]
+
+
+async def claim_bot_lease(worker_id: str, owner_id: int, lease_seconds: int) -> bool:
+    """Versucht die Lease für einen Shop zu übernehmen"""
+    try:
+        response = await run_query(db.rpc("claim_bot_lease", {
+            "p_worker_id": worker_id,
+            "p_owner_id": int(owner_id),
+            "p_lease_seconds": lease_seconds
+        }))
+        return bool(response.data)
+    except Exception as e:
+        print(f"Error claiming bot lease: {e}")
+        return False
+
+
+async def release_bot_leases(worker_id: str):
+    """Gibt alle Leases eines Workers frei (beim Shutdown)"""
+    await run_query(db.table("bot_leases").delete().eq("worker_id", worker_id))
+    await run_query(db.table("bot_workers").delete().eq("worker_id", worker_id))
+
+
 # ========================================
 # ORDER MANAGEMENT
 # ========================================
@@ -259,69 +462,85 @@ async def create_order(buyer_id: int, product_id, seller_id: int) -> Optional[Di
         "seller_id": int(seller_id),
         "status": "pending"
     }
-    response = db.table("orders").insert(data).execute()
+    response = await run_query(db.table("orders").insert(data))
     return response.data[0] if response.data else None
 
 
-async def confirm_order(order_id: str) -> Optional[str]:
+async def confirm_order(order_id: str, seller_id: int) -> Optional[Dict]:
     """
-    Bestätigt Bestellung und sendet Item
-    Returns: Item content oder "sold_out" oder None
+    Bestätigt Bestellung und entnimmt ein Item (ein RPC-Aufruf, atomar)
+    Returns: {
+        "status": "completed" | "sold_out" | "already_completed" | "not_found",
+        "item": str, "product_name": str, "buyer_id": int
+    } oder None bei Fehlern
+    Bei "already_completed" ist "item" das bereits zugeteilte Item (zum erneuten Senden)
     """
-    order_res = db.table("orders").select("*").eq("id", order_id).single().execute()
-    if not order_res.data:
-        return None
-    
-    order = order_res.data
-    p_id = order["product_id"]
-    query_id = int(p_id) if str(p_id).isdigit() else p_id
-    
-    product_res = db.table("products").select("content").eq("id", query_id).single().execute()
-    if not product_res.data:
+    try:
+        response = await run_query(db.rpc("confirm_order_tx", {
+            "p_order_id": order_id,
+            "p_seller_id": int(seller_id)
+        }))
+        if response.data and response.data.get("status") in ("completed", "sold_out"):
+            invalidate_catalog_cache(seller_id)
+        return response.data
+    except Exception as e:
+        print(f"Error confirming order: {e}")
         return None
+
+
+async def get_orders_page(
+    seller_id: int,
+    after: Optional[Dict] = None,
+    limit: int = 1000
+) -> List[Dict]:
+    """
+    Bestellungen eines Shops seitenweise, sortiert nach (created_at, id)
+    after: letzte Zeile der vorherigen Seite (Keyset-Cursor)
+    """
+    query = (
+        db.table("orders")
+        .select("id, created_at, updated_at, status, product_id, buyer_id, price")
+        .eq("seller_id", int(seller_id))
+    )
     
-    content = product_res.data.get("content", "")
-    items = [i for i in content.split("\n") if i.strip()]
-    
-    if not items:
-        return "sold_out"
-    
-    # Erstes Item entnehmen
-    item_to_send = items[0]
-    remaining_content = "\n".join(items[1:])
-    
-    # Update Produkt & Order
-    db.table("products").update({"content": remaining_content}).eq("id", query_id).execute()
-    db.table("orders").update({"status": "completed"}).eq("id", order_id).execute()
+    if after:
+        ts = after["created_at"]
+        query = query.or_(
+            f'created_at.gt."{ts}",and(created_at.eq."{ts}",id.gt.{after["id"]})'
+        )
     
-    return item_to_send
+    response = await run_query(query.order("created_at").order("id").limit(limit))
+    return response.data or []
 
 
 async def get_shop_customers(seller_id: int) -> List[int]:
     """Holt alle Kunden eines Shops"""
-    response = db.table("orders").select("buyer_id").eq("seller_id", int(seller_id)).execute()
+    response = await run_query(db.table("orders").select("buyer_id").eq("seller_id", int(seller_id)))
     if response.data:
         return list(set(item['buyer_id'] for item in response.data))
     return []
 
 
+async def get_seller_stats(seller_id: int) -> Dict[str, Any]:
+    """
+    Verkaufsstatistik eines Shops aus den Tages-Rollups (ein RPC-Aufruf)
+    Returns: total, completed, cancelled, pending, revenue,
+             today_/week_/month_ completed & revenue (Tage in UTC), top_products
+    """
+    response = await run_query(db.rpc("get_seller_stats", {"p_seller_id": int(seller_id)}))
+    return response.data or {}
+
+
 async def get_order_stats(seller_id: int) -> Dict[str, int]:
-    """Holt Bestellungs-Statistiken für einen Seller"""
-    response = db.table("orders").select("status", count="exact").eq("seller_id", int(seller_id)).execute()
+    """Holt Bestellungs-Statistiken für einen Seller (aus den Rollups)"""
+    stats = await get_seller_stats(seller_id)
     
-    stats = {
-        "total": response.count or 0,
-        "pending": 0,
-        "completed": 0
+    return {
+        "total": int(stats.get("total", 0)),
+        "pending": int(stats.get("pending", 0)),
+        "completed": int(stats.get("completed", 0)),
+        "cancelled": int(stats.get("cancelled", 0))
     }
-    
-    if response.data:
-        for order in response.data:
-            status = order.get("status", "pending")
-            if status in stats:
-                stats[status] += 1
-    
-    return stats
 
 
 # ========================================
@@ -329,31 +548,63 @@ async def get_order_stats(seller_id: int) -> Dict[str, int]:
 # ========================================
 
 async def get_all_users_stats() -> Dict[str, Any]:
-    """Holt System-weite Statistiken für Master Admin"""
-    profiles = db.table("profiles").select("*", count="exact").execute()
-    products = db.table("products").select("*", count="exact").execute()
-    orders = db.table("orders").select("*", count="exact").execute()
+    """Holt System-weite Statistiken für Master Admin (nur Zähler, per RPC aggregiert)"""
+    cached = stats_cache.get("system")
+    if cached is not None:
+        return dict(cached)
     
-    pro_count = len([u for u in profiles.data if u.get("is_pro")])
-    free_count = profiles.count - pro_count
+    response = await run_query(db.rpc("get_system_stats", {}))
+    data = response.data or {}
     
-    return {
-        "total_users": profiles.count or 0,
-        "free_users": free_count,
-        "pro_users": pro_count,
-        "total_products": products.count or 0,
-        "total_orders": orders.count or 0,
-        "users_data": profiles.data
+    stats = {
+        "total_users": data.get("total_users", 0),
+        "free_users": data.get("free_users", 0),
+        "pro_users": data.get("pro_users", 0),
+        "total_products": data.get("total_products", 0),
+        "total_orders": data.get("total_orders", 0)
     }
+    stats_cache.set("system", stats)
+    return dict(stats)
 
 
-async def get_pro_users_list() -> List[Dict]:
-    """Holt Liste aller PRO-User"""
-    response = db.table("profiles").select("*").eq("is_pro", True).execute()
-    return response.data
-
-
-async def get_free_users_list() -> List[Dict]:
-    """Holt Liste aller FREE-User"""
-    response = db.table("profiles").select("*").eq("is_pro", False).execute()
-    return response.data
+async def get_users_page(
+    is_pro: bool,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+    search: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Keyset-Seite der User-Liste (sortiert nach id, nur Anzeige-Spalten)
+    after_id: Seite nach dieser ID, before_id: Seite davor
+    Returns: {"users": [...], "has_prev": bool, "has_next": bool}
+    """
+    query = (
+        db.table("profiles")
+        .select("id, username, expiry_date")
+        .eq("is_pro", is_pro)
+    )
+    
+    if search:
+        # Platzhalter im Suchbegriff neutralisieren
+        pattern = search.replace("\\", "").replace("%", "").replace("*", "").replace("_", "\\_")
+        query = query.ilike("username", f"%{pattern}%")
+    
+    if before_id is not None:
+        query = query.lt("id", before_id).order("id", desc=True)
+    else:
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        query = query.order("id")
+    
+    # Eine Zeile mehr holen, um zu wissen, ob es weitergeht
+    response = await run_query(query.limit(limit + 1))
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if before_id is not None:
+        rows.reverse()
+        return {"users": rows, "has_prev": has_more, "has_next": True}
+    
+    return {"users": rows, "has_prev": after_id is not None, "has_next": has_more}
@@ -0,0 +1,184 @@
+"""
+Export Service
+CSV-Export von Bestellungen und Lagerbestand eines Shops
+Läuft in Hintergrund-Workern; Daten werden seitenweise in Temp-Dateien geschrieben
+und als Telegram-Dokument verschickt
+"""
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from config import Config
+from core.strings import Messages
+from services.db_service import get_user_products, get_orders_page, get_stock_items_page
+
+logger = logging.getLogger(__name__)
+
+# Zeilen pro DB-Abfrage
+EXPORT_PAGE_SIZE = 1000
+
+
+class ExportService:
+    """
+    Warteschlange + Worker für Shop-Exporte (ein laufender Export pro Shop)
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._pending: Set[int] = set()  # owner_ids in Warteschlange oder in Arbeit
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker())
+                for _ in range(Config.EXPORT_WORKERS)
+            ]
+
+    async def stop(self):
+        """
+        Worker beenden (Shutdown)
+        """
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, bot: Bot, chat_id: int, owner_id: int) -> bool:
+        """
+        Export einplanen (False wenn für den Shop schon einer läuft)
+        """
+        if owner_id in self._pending:
+            return False
+
+        self._ensure_workers()
+        self._pending.add(owner_id)
+        self._queue.put_nowait((bot, chat_id, owner_id))
+        return True
+
+    async def _worker(self):
+        while True:
+            bot, chat_id, owner_id = await self._queue.get()
+            try:
+                await self.export_shop(bot, chat_id, owner_id)
+            except Exception as e:
+                logger.error(f"❌ Export für Shop {owner_id} fehlgeschlagen: {e}")
+                try:
+                    await bot.send_message(chat_id, Messages.EXPORT_FAILED)
+                except Exception:
+                    pass
+            finally:
+                self._pending.discard(owner_id)
+                self._queue.task_done()
+
+    @staticmethod
+    def _open_csv(prefix: str, paths: List[str]):
+        """
+        Temp-Datei (UTF-8 mit BOM für Excel) + CSV-Writer
+        Der Pfad landet sofort in paths, damit auch Teil-Dateien aufgeräumt werden
+        """
+        handle = tempfile.NamedTemporaryFile(
+            mode="w",
+            prefix=prefix,
+            suffix=".csv",
+            newline="",
+            encoding="utf-8-sig",
+            delete=False
+        )
+        paths.append(handle.name)
+        return handle, csv.writer(handle, delimiter=";")
+
+    async def _write_orders(self, owner_id: int, product_names: Dict[int, str], paths: List[str]) -> Tuple[str, int]:
+        handle, writer = self._open_csv("orders_", paths)
+        rows = 0
+        try:
+            writer.writerow(["order_id", "created_at", "completed_at", "status", "product_id",
+                             "product_name", "buyer_id", "price_eur"])
+
+            cursor = None
+            while True:
+                page = await get_orders_page(owner_id, after=cursor, limit=EXPORT_PAGE_SIZE)
+                for order in page:
+                    writer.writerow([
+                        order["id"],
+                        order["created_at"],
+                        order["updated_at"] if order.get("status") == "completed" else "",
+                        order.get("status"),
+                        order["product_id"],
+                        product_names.get(order["product_id"], ""),
+                        order["buyer_id"],
+                        order.get("price") if order.get("price") is not None else ""
+                    ])
+                rows += len(page)
+
+                if len(page) < EXPORT_PAGE_SIZE:
+                    break
+                cursor = page[-1]
+        finally:
+            handle.close()
+        return handle.name, rows
+
+    async def _write_stock(self, products: List[Dict], paths: List[str]) -> Tuple[str, int]:
+        handle, writer = self._open_csv("stock_", paths)
+        rows = 0
+        try:
+            writer.writerow(["product_id", "product_name", "item_id", "content", "added_at"])
+
+            for product in products:
+                after_id = 0
+                while True:
+                    page = await get_stock_items_page(product["id"], after_id, EXPORT_PAGE_SIZE)
+                    for item in page:
+                        writer.writerow([
+                            product["id"], product["name"], item["id"], item["content"], item["created_at"]
+                        ])
+                    rows += len(page)
+
+                    if len(page) < EXPORT_PAGE_SIZE:
+                        break
+                    after_id = page[-1]["id"]
+        finally:
+            handle.close()
+        return handle.name, rows
+
+    async def export_shop(self, bot: Bot, chat_id: int, owner_id: int):
+        """
+        Bestellungen + Lagerbestand als zwei CSV-Dokumente senden
+        """
+        products = await get_user_products(owner_id)
+        product_names = {product["id"]: product["name"] for product in products}
+        stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+        paths = []
+        try:
+            orders_path, order_rows = await self._write_orders(owner_id, product_names, paths)
+            stock_path, stock_rows = await self._write_stock(products, paths)
+
+            await bot.send_document(
+                chat_id,
+                FSInputFile(orders_path, filename=f"bestellungen_{stamp}.csv"),
+                caption=Messages.EXPORT_ORDERS_CAPTION.format(count=order_rows)
+            )
+            await bot.send_document(
+                chat_id,
+                FSInputFile(stock_path, filename=f"lager_{stamp}.csv"),
+                caption=Messages.EXPORT_STOCK_CAPTION.format(count=stock_rows, products=len(products))
+            )
+            logger.info(f"📤 Export für Shop {owner_id}: {order_rows} Bestellungen, {stock_rows} Items")
+        finally:
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
+# Globale Instanz
+export_service = ExportService()
@@ -0,0 +1,124 @@
+"""
+Lease Manager
+Worker-Modus: mehrere Prozesse/Hosts teilen sich die Shop-Bots.
+Jeder Worker hält Leases in der Datenbank (mit Heartbeat) und startet nur diese Bots.
+Fällt ein Worker aus, laufen seine Leases ab und die übrigen übernehmen.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Set
+from aiogram import Dispatcher
+from config import Config
+from services.db_service import (
+    sync_bot_leases, claim_bot_lease, release_bot_leases, get_bot_tokens
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """
+    Hält die Leases dieses Workers aktuell und gleicht laufende Bots ab
+    """
+
+    def __init__(self):
+        self.worker_id = Config.WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+        self.held: Set[int] = set()  # owner_ids mit eigener Lease
+        self.renewed_at = 0.0  # monotonic, letzte erfolgreiche Verlängerung
+
+    @property
+    def enabled(self) -> bool:
+        return Config.WORKER_MODE == "sharded"
+
+    async def claim(self, owner_id: int) -> bool:
+        """
+        Lease für einen Shop sichern (True im Einzelprozess-Modus)
+        """
+        if not self.enabled or owner_id in self.held:
+            return True
+
+        if await claim_bot_lease(self.worker_id, owner_id, Config.LEASE_TTL):
+            self.held.add(owner_id)
+            return True
+        return False
+
+    async def sync(self, dispatcher: Dispatcher):
+        """
+        Leases verlängern/übernehmen und Bots entsprechend starten/stoppen
+        """
+        from services.bot_manager import bot_manager
+
+        held = set(await sync_bot_leases(self.worker_id, Config.LEASE_TTL))
+        self.renewed_at = time.monotonic()
+
+        # Verlorene oder abgegebene Leases: Bots stoppen
+        for owner_id in set(bot_manager.get_active_user_ids()) - held:
+            await bot_manager.stop_shop_bot(owner_id, delete_webhook=False)
+            logger.info(f"↪️ Shop {owner_id} an anderen Worker abgegeben")
+
+        self.held = held
+
+        if not held:
+            return
+
+        # Neue Leases: Bots starten - stillgelegte nur, wenn der Token inzwischen
+        # geändert wurde (z.B. über einen anderen Worker)
+        # Laufende Bots mit geändertem Token: neu starten (start_shop_bot erkennt das)
+        shops = []
+        for shop in await get_bot_tokens(list(held)):
+            token = shop["custom_bot_token"]
+            running_token = bot_manager.get_bot_token(shop["id"])
+            if running_token is None:
+                if not bot_manager.is_bot_dead(shop["id"], token):
+                    shops.append(shop)
+            elif running_token != token:
+                shops.append(shop)
+        if shops:
+            await bot_manager.start_shop_bots(shops, dispatcher)
+
+    async def _fence(self):
+        """
+        Verlängerung zu lange fehlgeschlagen: Leases gelten als verloren,
+        alle Bots stoppen, damit kein Bot doppelt läuft
+        """
+        from services.bot_manager import bot_manager
+
+        if self.held and time.monotonic() - self.renewed_at > Config.LEASE_TTL:
+            logger.error("❌ Leases abgelaufen (DB nicht erreichbar) - stoppe alle Shop-Bots")
+            self.held.clear()
+            await bot_manager.stop_all_bots(delete_webhook=False)
+
+    async def run(self, dispatcher: Dispatcher):
+        """
+        Hintergrund-Loop (läuft bis zum Shutdown)
+        """
+        logger.info(f"🧩 Worker {self.worker_id} gestartet (Lease: {Config.LEASE_TTL}s)")
+
+        while True:
+            try:
+                await self.sync(dispatcher)
+            except Exception as e:
+                logger.error(f"Fehler beim Lease-Abgleich: {e}")
+                await self._fence()
+
+            await asyncio.sleep(Config.LEASE_RENEW_INTERVAL)
+
+    async def release_all(self):
+        """
+        Alle Leases freigeben (beim Shutdown, damit andere sofort übernehmen)
+        """
+        if not self.enabled:
+            return
+
+        try:
+            await release_bot_leases(self.worker_id)
+        except Exception as e:
+            logger.warning(f"Leases konnten nicht freigegeben werden: {e}")
+        self.held.clear()
+
+
+# Globale Instanz
+lease_manager = LeaseManager()
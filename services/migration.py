@@ -7,9 +7,9 @@ import logging
 from typing import List, Dict, Any
 from services.db_service import (
     get_user_products, get_user_categories,
-    get_user_by_id, update_product
+    get_user_by_id, update_product, invalidate_user_cache
 )
-from core.supabase_client import db
+from core.supabase_client import db, run_query
 
 logger = logging.getLogger(__name__)
 
@@ -48,10 +48,11 @@ async def migrate_products_to_custom_bot(user_id: int) -> Dict[str, Any]:
         
         # Migration-Flag in der DB setzen
         # Dies markiert, dass Produkte nun über den Custom-Bot verfügbar sind
-        db.table("profiles").update({
+        await run_query(db.table("profiles").update({
             "migration_completed": True,
             "migration_date": "NOW()"
-        }).eq("id", user_id).execute()
+        }).eq("id", user_id))
+        invalidate_user_cache(user_id)
         
         logger.info(
             f"✅ Migration abgeschlossen für User {user_id}: "
@@ -130,10 +131,11 @@ async def rollback_migration(user_id: int) -> bool:
     Macht Migration rückgängig (falls nötig)
     """
     try:
-        db.table("profiles").update({
+        await run_query(db.table("profiles").update({
             "migration_completed": False,
             "migration_date": None
-        }).eq("id", user_id).execute()
+        }).eq("id", user_id))
+        invalidate_user_cache(user_id)
         
         logger.info(f"Migration für User {user_id} zurückgesetzt")
         return True
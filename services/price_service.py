@@ -0,0 +1,157 @@
+"""
+Price Service
+Krypto-Kurse (BTC/LTC/ETH/SOL) mit gemeinsamem HTTP-Client, Cache pro Asset,
+Stale-While-Revalidate und zusammengefassten parallelen Anfragen
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+import httpx
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ASSETS = ("BTC", "LTC", "ETH", "SOL")
+
+# Nachkommastellen für die Anzeige
+ASSET_DECIMALS = {"BTC": 8, "LTC": 8, "ETH": 6, "SOL": 4}
+
+
+class CoinbasePriceSource:
+    """
+    Spot-Kurse von Coinbase (ein gepoolter Client für alle Anfragen)
+    """
+
+    URL = "https://api.coinbase.com/v2/prices/{asset}-{currency}/spot"
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=Config.PRICE_HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                http2=True
+            )
+        return self._client
+
+    async def fetch(self, asset: str, currency: str) -> float:
+        response = await self._get_client().get(self.URL.format(asset=asset, currency=currency))
+        response.raise_for_status()
+        return float(response.json()["data"]["amount"])
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StaticPriceSource:
+    """
+    Feste Kurse (lokal/Tests), z.B. StaticPriceSource({"LTC": 70.0})
+    """
+
+    def __init__(self, prices: Dict[str, float]):
+        self.prices = prices
+
+    async def fetch(self, asset: str, currency: str) -> float:
+        return self.prices[asset]
+
+    async def close(self):
+        pass
+
+
+class PriceService:
+    """
+    Kurs-Cache: frische Kurse direkt, veraltete sofort + Aktualisierung im Hintergrund,
+    gleichzeitige Anfragen für dasselbe Paar teilen sich einen Request
+    """
+
+    def __init__(self, source=None):
+        self.source = source or CoinbasePriceSource()
+        self._quotes: Dict[Tuple[str, str], Tuple[float, float]] = {}  # (asset, currency) -> (price, fetched_at)
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    async def set_source(self, source):
+        """
+        Kursquelle austauschen (Cache wird geleert)
+        """
+        await self.source.close()
+        self.source = source
+        self._quotes.clear()
+
+    def _refresh(self, key: Tuple[str, str]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: Tuple[str, str]) -> Optional[float]:
+        asset, currency = key
+        try:
+            price = await self.source.fetch(asset, currency)
+        except Exception as e:
+            logger.warning(f"Kurs {asset}-{currency} nicht abrufbar: {e}")
+            return None
+
+        self._quotes[key] = (price, time.monotonic())
+        return price
+
+    async def get_price(self, asset: str, currency: str = "EUR") -> Optional[float]:
+        """
+        Kurs für 1 Einheit asset in currency (None wenn nicht verfügbar)
+        """
+        key = (asset.upper(), currency.upper())
+        entry = self._quotes.get(key)
+
+        if entry:
+            price, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < Config.PRICE_CACHE_TTL:
+                return price
+            if age < Config.PRICE_MAX_STALE:
+                self._refresh(key)  # Im Hintergrund, veralteten Kurs sofort liefern
+                return price
+
+        price = await self._refresh(key)
+        if price is None and entry:
+            return entry[0]  # Quelle nicht erreichbar: letzter bekannter Kurs
+        return price
+
+    async def keep_warm(self, currency: str = "EUR"):
+        """
+        Kurse aller Assets sofort laden und vor Ablauf erneuern (läuft bis zum Shutdown),
+        damit Käufer nie auf die Kursquelle warten
+        """
+        keys = [(asset, currency.upper()) for asset in SUPPORTED_ASSETS]
+        while True:
+            await asyncio.gather(*(self._refresh(key) for key in keys))
+            await asyncio.sleep(Config.PRICE_CACHE_TTL)
+
+    async def convert(self, eur_amount: float, asset: str) -> Optional[float]:
+        """
+        EUR-Betrag in asset umrechnen
+        """
+        price = await self.get_price(asset, "EUR")
+        if not price:
+            return None
+        return round(float(eur_amount) / price, ASSET_DECIMALS.get(asset.upper(), 8))
+
+    async def quote(self, eur_amount: float, assets: Iterable[str]) -> Dict[str, float]:
+        """
+        EUR-Betrag in mehrere Assets umrechnen (parallel, fehlende werden ausgelassen)
+        """
+        assets = [asset.upper() for asset in assets if asset.upper() in SUPPORTED_ASSETS]
+        amounts = await asyncio.gather(*(self.convert(eur_amount, asset) for asset in assets))
+        return {asset: amount for asset, amount in zip(assets, amounts) if amount is not None}
+
+    async def close(self):
+        await self.source.close()
+
+
+# Globale Instanz
+price_service = PriceService()
@@ -0,0 +1,207 @@
+"""
+Send Scheduler
+Drosselt alle ausgehenden Telegram-Nachrichten (pro Bot & pro Chat),
+behandelt RetryAfter automatisch und bevorzugt wichtige Nachrichten
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Union
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Prioritäten (kleiner = wichtiger)
+PRIORITY_HIGH = 0  # Auslieferung bestätigter Bestellungen
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2  # Katalog-Ansichten
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "send_priority", default=PRIORITY_NORMAL
+)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """
+    Setzt die Priorität für alle Telegram-Requests im Block
+
+    Beispiel:
+        with send_priority(PRIORITY_HIGH):
+            await bot.send_message(...)
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token-Bucket mit Prioritäts-Warteschlange
+    Wartende werden nach Priorität, dann in Ankunftsreihenfolge bedient
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # Tokens pro Sekunde
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._drainer: asyncio.Task = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self) -> bool:
+        """
+        Keine Wartenden und wieder voll aufgefüllt
+        """
+        self._refill()
+        return not self._waiters and self.tokens >= self.capacity
+
+    def pause(self, seconds: float):
+        """
+        Bucket für X Sekunden sperren (nach RetryAfter)
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        """
+        Wartet auf ein Token
+        """
+        self._refill()
+        if not self._waiters and self.tokens >= 1 and time.monotonic() >= self.blocked_until:
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        await future
+
+    async def _drain(self):
+        while self._waiters:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            # Abgebrochene Wartende verwerfen
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                _, _, future = heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Request-Middleware für die Bot-Session
+    Alle Methoden mit chat_id (send_*, edit_*, ...) laufen durch
+    einen Bucket pro Chat und einen Bucket pro Bot
+    """
+
+    def __init__(self):
+        self.bot_buckets: Dict[int, TokenBucket] = {}  # bot_id -> Bucket
+        self.chat_buckets: Dict[Tuple[int, Union[int, str]], TokenBucket] = {}  # (bot_id, chat_id) -> Bucket
+        self.retry_after_count = 0
+
+    def _bot_bucket(self, bot_id: int) -> TokenBucket:
+        bucket = self.bot_buckets.get(bot_id)
+        if bucket is None:
+            bucket = TokenBucket(Config.SEND_RATE_PER_BOT, Config.SEND_RATE_PER_BOT)
+            self.bot_buckets[bot_id] = bucket
+        return bucket
+
+    def _chat_bucket(self, bot_id: int, chat_id: Union[int, str]) -> TokenBucket:
+        key = (bot_id, chat_id)
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            if len(self.chat_buckets) >= Config.SEND_MAX_CHAT_BUCKETS:
+                self._prune_chat_buckets()
+
+            # Gruppen/Kanäle (negative IDs oder @username) haben ein strengeres Limit
+            is_group = not isinstance(chat_id, int) or chat_id < 0
+            rate = Config.SEND_RATE_PER_GROUP if is_group else Config.SEND_RATE_PER_CHAT
+            bucket = TokenBucket(rate, Config.SEND_CHAT_BURST)
+            self.chat_buckets[key] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        idle = [key for key, bucket in self.chat_buckets.items() if bucket.is_idle()]
+        for key in idle:
+            del self.chat_buckets[key]
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        chat_id = getattr(method, "chat_id", None)
+
+        # get_updates, get_me, answer_callback_query, ... nicht drosseln
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = _current_priority.get()
+        chat_bucket = self._chat_bucket(bot.id, chat_id)
+        bot_bucket = self._bot_bucket(bot.id)
+
+        attempt = 0
+        while True:
+            await chat_bucket.acquire(priority)
+            await bot_bucket.acquire(priority)
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.retry_after_count += 1
+                if attempt > Config.SEND_MAX_RETRIES:
+                    raise
+
+                logger.warning(
+                    f"⏳ Flood-Limit für Chat {chat_id} (Bot {bot.id}): "
+                    f"warte {e.retry_after}s (Versuch {attempt}/{Config.SEND_MAX_RETRIES})"
+                )
+                chat_bucket.pause(e.retry_after)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Kennzahlen für Monitoring
+        """
+        return {
+            "bots": len(self.bot_buckets),
+            "chats": len(self.chat_buckets),
+            "retry_after": self.retry_after_count
+        }
+
+
+# Globale Instanz
+send_scheduler = SendScheduler()
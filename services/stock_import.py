@@ -0,0 +1,132 @@
+"""
+Stock Import
+Lagerbestand aus hochgeladenen Dateien (.txt: ein Item pro Zeile, .csv: eine Spalte)
+Die Datei wird zeilenweise gelesen, dedupliziert und in Batches eingefügt
+"""
+import csv
+import logging
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+from aiogram import Bot
+from aiogram.types import Document
+from services.db_service import STOCK_BATCH_SIZE, insert_stock_items, invalidate_catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# Fortschrittsmeldung höchstens so oft aktualisieren (Sekunden)
+PROGRESS_INTERVAL = 2.0
+
+# Max. Länge eines Items (längere Zeilen werden übersprungen)
+MAX_ITEM_LENGTH = 4096
+
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]  # (gelesen, hinzugefügt, übersprungen)
+
+
+def _iter_lines(handle) -> Iterator[str]:
+    for line in handle:
+        yield line.strip()
+
+
+def _iter_csv_column(handle, column: Optional[str]) -> Iterator[str]:
+    """
+    Eine Spalte aus einer CSV-Datei
+    column: 1-basierte Nummer oder Spaltenname (dann ist die erste Zeile der Header)
+    Bei Spaltennummer wird ein vom Sniffer erkannter Header übersprungen
+    """
+    sample = handle.read(8192)
+    handle.seek(0)
+    sniffer = csv.Sniffer()
+    try:
+        dialect = sniffer.sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(handle, dialect)
+    index = 0
+
+    if column and not column.isdigit():
+        header = [cell.strip().lower() for cell in next(reader, [])]
+        if column.lower() not in header:
+            raise ValueError(f"Spalte '{column}' nicht gefunden")
+        index = header.index(column.lower())
+    else:
+        index = max(int(column) - 1, 0) if column else 0
+        try:
+            has_header = sniffer.has_header(sample)
+        except csv.Error:
+            has_header = False
+        if has_header:
+            next(reader, None)
+
+    for row in reader:
+        yield row[index].strip() if index < len(row) else ""
+
+
+async def import_stock_file(
+    bot: Bot,
+    document: Document,
+    product_id,
+    owner_id: int,
+    column: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> Dict[str, int]:
+    """
+    Datei herunterladen, Items streamen und einfügen
+    Returns: {"read", "added", "skipped", "failed"} (skipped = leer, zu lang, doppelt oder schon im Lager)
+    Bei einem Fehler bleiben bereits eingefügte Batches erhalten (failed = 1)
+    """
+    is_csv = (document.file_name or "").lower().endswith(".csv") or document.mime_type == "text/csv"
+
+    handle = tempfile.NamedTemporaryFile(suffix=".csv" if is_csv else ".txt", delete=False)
+    handle.close()
+    path = handle.name
+
+    seen = set()
+    batch = []
+    read = added = skipped = failed = 0
+    last_progress = time.monotonic()
+
+    try:
+        await bot.download(document, destination=path)
+
+        with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as source:
+            items = _iter_csv_column(source, column) if is_csv else _iter_lines(source)
+
+            for item in items:
+                read += 1
+                if not item or len(item) > MAX_ITEM_LENGTH or item in seen:
+                    skipped += 1
+                    continue
+
+                seen.add(item)
+                batch.append(item)
+
+                if len(batch) >= STOCK_BATCH_SIZE:
+                    inserted = await insert_stock_items(product_id, batch)
+                    added += inserted
+                    skipped += len(batch) - inserted
+                    batch = []
+
+                    if on_progress and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = time.monotonic()
+                        await on_progress(read, added, skipped)
+
+            if batch:
+                inserted = await insert_stock_items(product_id, batch)
+                added += inserted
+                skipped += len(batch) - inserted
+    except Exception as e:
+        logger.error(f"❌ Import Produkt {product_id} abgebrochen nach {added} Items: {e}")
+        failed = 1
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        if added:
+            invalidate_catalog_cache(owner_id)
+
+    logger.info(f"📥 Import Produkt {product_id}: {added} hinzugefügt, {skipped} übersprungen ({read} Zeilen)")
+    return {"read": read, "added": added, "skipped": skipped, "failed": failed}
@@ -1,12 +1,17 @@
+import logging
 from datetime import datetime, timedelta, timezone
-from core.supabase_client import db
+from core.supabase_client import db, run_query
+from services.db_service import invalidate_user_cache
+from tasks.expiry_check import expiry_scheduler
+
+logger = logging.getLogger(__name__)
 
 async def check_subscription_status(telegram_id: int) -> bool:
     """
     Prüft ob PRO-Subscription noch aktiv ist
     Returns: True wenn aktiv, False wenn abgelaufen
     """
-    response = db.table("profiles").select("is_pro, expiry_date").eq("id", telegram_id).execute()
+    response = await run_query(db.table("profiles").select("is_pro, expiry_date").eq("id", telegram_id))
     if not response.data:
         return False
     
@@ -20,7 +25,8 @@ async def check_subscription_status(telegram_id: int) -> bool:
             expiry = datetime.fromisoformat(user["expiry_date"].replace('Z', '+00:00'))
             if datetime.now(timezone.utc) > expiry:
                 # Subscription abgelaufen -> auf FREE zurücksetzen
-                db.table("profiles").update({"is_pro": False}).eq("id", telegram_id).execute()
+                await run_query(db.table("profiles").update({"is_pro": False}).eq("id", telegram_id))
+                invalidate_user_cache(telegram_id)
                 return False
         except Exception as e:
             print(f"Error parsing expiry_date: {e}")
@@ -40,7 +46,9 @@ async def activate_pro_subscription(telegram_id: int, months: int = 1):
         "expiry_date": new_expiry.isoformat()
     }
     
-    db.table("profiles").update(data).eq("id", telegram_id).execute()
+    await run_query(db.table("profiles").update(data).eq("id", telegram_id))
+    invalidate_user_cache(telegram_id)
+    expiry_scheduler.schedule(telegram_id, new_expiry)
 
 
 async def cancel_subscription(telegram_id: int):
@@ -50,10 +58,12 @@ async def cancel_subscription(telegram_id: int):
     from services.bot_manager import bot_manager
     
     # PRO deaktivieren
-    db.table("profiles").update({
+    await run_query(db.table("profiles").update({
         "is_pro": False,
         "expiry_date": None
-    }).eq("id", telegram_id).execute()
+    }).eq("id", telegram_id))
+    invalidate_user_cache(telegram_id)
+    expiry_scheduler.unschedule(telegram_id)
     
     # Eigenen Bot stoppen (falls läuft)
     if bot_manager.is_bot_running(telegram_id):
@@ -71,7 +81,7 @@ async def reactivate_subscription(telegram_id: int, months: int = 1):
     await activate_pro_subscription(telegram_id, months)
     
     # Bot neu starten (falls Token vorhanden)
-    response = db.table("profiles").select("custom_bot_token").eq("id", telegram_id).execute()
+    response = await run_query(db.table("profiles").select("custom_bot_token").eq("id", telegram_id))
     
     if response.data and response.data[0].get("custom_bot_token"):
         token = response.data[0]["custom_bot_token"]
@@ -99,7 +109,7 @@ async def extend_subscription(telegram_id: int, months: int = 1):
     """
     Verlängert bestehende Subscription um X Monate
     """
-    response = db.table("profiles").select("expiry_date").eq("id", telegram_id).execute()
+    response = await run_query(db.table("profiles").select("expiry_date").eq("id", telegram_id))
     
     if not response.data:
         return
@@ -120,7 +130,9 @@ async def extend_subscription(telegram_id: int, months: int = 1):
     else:
         new_expiry = datetime.now(timezone.utc) + timedelta(days=30 * months)
     
-    db.table("profiles").update({
+    await run_query(db.table("profiles").update({
         "is_pro": True,
         "expiry_date": new_expiry.isoformat()
-    }).eq("id", telegram_id).execute()
+    }).eq("id", telegram_id))
+    invalidate_user_cache(telegram_id)
+    expiry_scheduler.schedule(telegram_id, new_expiry)
@@ -0,0 +1,135 @@
+"""
+Webhook Server
+Ein aiohttp-Server für alle Bots: Health-Check und Webhook-Empfang.
+Updates werden über einen geheimen Pfad pro Bot in den gemeinsamen Dispatcher geleitet.
+"""
+import hashlib
+import hmac
+import logging
+from typing import Dict, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from pydantic import ValidationError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """
+    Verwaltet den HTTP-Server und die Zuordnung Secret -> Bot
+    """
+
+    def __init__(self):
+        self.bots: Dict[str, Bot] = {}  # secret -> Bot instance
+        self.dispatcher: Optional[Dispatcher] = None
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/", self.health)
+        self.app.router.add_post("/webhook/{secret}", self.handle_update)
+
+    @staticmethod
+    def secret_for(bot_token: str) -> str:
+        """
+        Geheimer Pfad/Secret-Token eines Bots (aus dem Token abgeleitet, Token selbst bleibt privat)
+        """
+        digest = hmac.new(
+            Config.WEBHOOK_SECRET.encode(),
+            bot_token.encode(),
+            hashlib.sha256
+        )
+        return digest.hexdigest()[:48]
+
+    @staticmethod
+    def url_for(secret: str) -> str:
+        """
+        Öffentliche Webhook-URL für ein Secret
+        """
+        return f"{Config.WEBHOOK_BASE_URL.rstrip('/')}/webhook/{secret}"
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.Response(text=f"{Config.BRAND_NAME} v{Config.VERSION} is running")
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """
+        Nimmt ein Update entgegen und verarbeitet es im Hintergrund
+        (Telegram bekommt sofort 200 zurück)
+        """
+        secret = request.match_info["secret"]
+        bot = self.bots.get(secret)
+
+        if bot is None or request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Ungültiges Webhook-Update verworfen (Bot {bot.id}): {e}")
+            return web.Response(status=400)
+
+        # Gleicher Wrapper wie beim Polling (Handler-Fehler werden geloggt)
+        from services.bot_manager import bot_manager
+        bot_manager.feed_update(self.dispatcher, bot, update)
+
+        return web.Response()
+
+    async def register_bot(self, bot: Bot, drop_pending_updates: bool = True):
+        """
+        Webhook bei Telegram setzen und Bot für Updates registrieren
+        """
+        secret = self.secret_for(bot.token)
+        self.bots[secret] = bot
+
+        try:
+            await bot.set_webhook(
+                url=self.url_for(secret),
+                secret_token=secret,
+                drop_pending_updates=drop_pending_updates,
+                allowed_updates=self.dispatcher.resolve_used_update_types()
+            )
+        except Exception:
+            self.bots.pop(secret, None)
+            raise
+
+    async def unregister_bot(self, bot: Bot, delete_webhook: bool = True):
+        """
+        Bot austragen und Webhook bei Telegram entfernen
+        delete_webhook=False: Webhook bleibt (z.B. Lease an anderen Worker abgegeben,
+        der ihn bereits neu gesetzt haben kann)
+        """
+        self.bots.pop(self.secret_for(bot.token), None)
+
+        if not delete_webhook:
+            return
+
+        try:
+            await bot.delete_webhook()
+        except Exception as e:
+            logger.warning(f"Webhook konnte nicht entfernt werden: {e}")
+
+    async def start(self, dispatcher: Dispatcher):
+        """
+        HTTP-Server starten (Health-Check läuft in jedem Modus)
+        """
+        self.dispatcher = dispatcher
+
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host="0.0.0.0", port=Config.PORT)
+        await site.start()
+
+        logger.info(f"🌐 HTTP-Server läuft auf Port {Config.PORT} (Modus: {Config.BOT_MODE})")
+
+    async def stop(self):
+        """
+        HTTP-Server stoppen
+        """
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Globale Instanz
+webhook_server = WebhookServer()
@@ -1,64 +1,183 @@
 import asyncio
+import heapq
 import logging
+import time
 from datetime import datetime, timezone
-from core.supabase_client import db
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from core.supabase_client import db, run_query
+from services.db_service import invalidate_user_cache
 
 logger = logging.getLogger(__name__)
 
+# Max. Zeilen pro Abfrage beim Laden der Ablaufdaten
+LOAD_BATCH_SIZE = 1000
+
+
+def parse_expiry(value) -> Optional[datetime]:
+    """ISO-Zeitstempel (str) oder datetime -> datetime mit Zeitzone"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class ExpiryScheduler:
+    """
+    Min-Heap der nächsten Ablaufzeitpunkte
+    Jede Subscription läuft exakt zu ihrem expiry_date ab; ein periodischer
+    Sweep in der DB fängt alles ab, was hier nicht eingeplant wurde
+    (z.B. Änderungen aus anderen Prozessen)
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []  # (expiry_ts, user_id)
+        self._expiry: Dict[int, float] = {}  # user_id -> gültiger Eintrag (ältere im Heap werden übersprungen)
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, user_id: int, expiry) -> None:
+        """
+        Ablauf einplanen bzw. verschieben (nach Aktivierung/Verlängerung)
+        """
+        expiry_dt = parse_expiry(expiry)
+        if expiry_dt is None:
+            self.unschedule(user_id)
+            return
+
+        ts = expiry_dt.timestamp()
+        self._expiry[user_id] = ts
+        heapq.heappush(self._heap, (ts, user_id))
+        self._wakeup.set()
+
+    def unschedule(self, user_id: int) -> None:
+        """
+        Geplanten Ablauf verwerfen (z.B. nach Kündigung)
+        """
+        self._expiry.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    async def load(self):
+        """
+        Ablaufdaten aller PRO-User laden (nur id + expiry_date, seitenweise)
+        """
+        last_id = 0
+        while True:
+            response = await run_query(
+                db.table("profiles")
+                .select("id, expiry_date")
+                .eq("is_pro", True)
+                .not_.is_("expiry_date", "null")
+                .gt("id", last_id)
+                .order("id")
+                .limit(LOAD_BATCH_SIZE)
+            )
+            rows = response.data or []
+            for row in rows:
+                self.schedule(row["id"], row["expiry_date"])
+
+            if len(rows) < LOAD_BATCH_SIZE:
+                break
+            last_id = rows[-1]["id"]
+
+        logger.info(f"⏰ {len(self)} PRO-Subscriptions eingeplant")
+
+    async def _deactivate(self, user_ids: List[int]):
+        """
+        Cache leeren und Bots abgelaufener User stoppen
+        """
+        from services.bot_manager import bot_manager
+
+        for user_id in user_ids:
+            self.unschedule(user_id)
+            invalidate_user_cache(user_id)
+
+            if bot_manager.is_bot_running(user_id):
+                await bot_manager.stop_shop_bot(user_id)
+                logger.info(f"🛑 Shop-Bot für User {user_id} gestoppt (PRO abgelaufen)")
+
+            logger.info(f"⏰ User {user_id} PRO-Status abgelaufen")
+
+    async def expire(self, user_id: int):
+        """
+        Einzelnen User deaktivieren - nur wenn expiry_date inzwischen nicht verlängert wurde
+        """
+        response = await run_query(
+            db.table("profiles")
+            .update({"is_pro": False})
+            .eq("id", user_id)
+            .eq("is_pro", True)
+            .lte("expiry_date", datetime.now(timezone.utc).isoformat())
+        )
+        if response.data:
+            await self._deactivate([user_id])
+
+    async def sweep(self):
+        """
+        Sicherheitsnetz: alle überfälligen Subscriptions in einem UPDATE deaktivieren
+        """
+        response = await run_query(db.rpc("expire_pro_subscriptions", {}))
+        expired_ids = [int(user_id) for user_id in response.data or []]
+
+        if expired_ids:
+            await self._deactivate(expired_ids)
+            logger.info(f"✅ {len(expired_ids)} abgelaufene PRO-Subscriptions per Sweep deaktiviert")
+
+    async def run(self):
+        """
+        Hauptschleife: schläft bis zum nächsten Ablauf, Sweep oder neuen Eintrag
+        """
+        await self.load()
+        next_sweep = 0.0
+
+        while True:
+            now = time.time()
+
+            # Fällige Einträge abarbeiten
+            while self._heap and self._heap[0][0] <= now:
+                ts, user_id = heapq.heappop(self._heap)
+                if self._expiry.get(user_id) != ts:
+                    continue  # Veraltet (verlängert oder gekündigt)
+                try:
+                    await self.expire(user_id)
+                except Exception as e:
+                    logger.error(f"Fehler beim Ablauf von User {user_id}: {e}")
+                    next_sweep = 0.0  # Sweep holt es nach
+                if self._expiry.get(user_id) == ts:
+                    del self._expiry[user_id]
+
+            if now >= next_sweep:
+                try:
+                    await self.sweep()
+                except Exception as e:
+                    logger.error(f"Fehler beim Expiry-Sweep: {e}")
+                next_sweep = time.time() + Config.EXPIRY_SWEEP_INTERVAL
+
+            # Schlafen bis zum nächsten Ereignis
+            timeout = next_sweep - time.time()
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.time())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Globale Instanz
+expiry_scheduler = ExpiryScheduler()
+
 
 async def check_subscription_expiry():
     """
-    Prüft alle PRO-User auf abgelaufene Subscriptions
+    Deaktiviert PRO-Subscriptions exakt zum Ablaufzeitpunkt
     Stoppt automatisch Bots bei Ablauf
-    Läuft im Hintergrund alle 24 Stunden
+    Läuft im Hintergrund (Sweep alle EXPIRY_SWEEP_INTERVAL Sekunden)
     """
-    from services.bot_manager import bot_manager
-    
-    while True:
-        try:
-            # Alle PRO-User mit Ablaufdatum holen
-            response = db.table("profiles").select("*").eq("is_pro", True).execute()
-            
-            if response.data:
-                now = datetime.now(timezone.utc)
-                expired_count = 0
-                
-                for user in response.data:
-                    if user.get("expiry_date"):
-                        try:
-                            expiry = datetime.fromisoformat(
-                                user["expiry_date"].replace('Z', '+00:00')
-                            )
-                            
-                            # Abgelaufen?
-                            if now > expiry:
-                                # PRO deaktivieren
-                                db.table("profiles").update({
-                                    "is_pro": False
-                                }).eq("id", user["id"]).execute()
-                                
-                                # Bot stoppen (falls läuft)
-                                if bot_manager.is_bot_running(user["id"]):
-                                    await bot_manager.stop_shop_bot(user["id"])
-                                    logger.info(
-                                        f"🛑 Shop-Bot für User {user['id']} "
-                                        f"gestoppt (PRO abgelaufen)"
-                                    )
-                                
-                                expired_count += 1
-                                logger.info(f"⏰ User {user['id']} PRO-Status abgelaufen")
-                        
-                        except Exception as e:
-                            logger.error(f"Fehler bei User {user['id']}: {e}")
-                
-                if expired_count > 0:
-                    logger.info(
-                        f"✅ {expired_count} abgelaufene PRO-Subscriptions "
-                        f"deaktiviert und Bots gestoppt"
-                    )
-        
-        except Exception as e:
-            logger.error(f"Fehler beim Expiry-Check: {e}")
-        
-        # 24 Stunden warten
-        await asyncio.sleep(86400)
+    await expiry_scheduler.run()